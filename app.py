@@ -1,13 +1,14 @@
-import threading
-import time
 from flask import Flask, render_template
 from flask_sqlalchemy import SQLAlchemy
 from flask_cors import CORS
 from flask_jwt_extended import JWTManager
 from routes.cache.config import Config
+from routes.cache import instrumentation
 from models import db
 from models.issue import Issue
-from routes.cache.email import process_unsent_issues  , process_overdue_issues
+from models.migrations import upgrade_schema
+from routes.cache.email import process_unsent_issues  , process_overdue_issues, process_issue_ids
+from routes.cache.pipeline import pipeline
 
 app = Flask(__name__)
 app.config.from_object(Config)
@@ -19,6 +20,8 @@ db.init_app(app)
 
 jwt = JWTManager(app)
 
+instrumentation.init_app(app)  # ✅ Per-endpoint latency for /api/metrics
+
 @app.route("/")
 def home():
     return render_template("index.html")
@@ -50,20 +53,28 @@ def train_test_model():
 from routes.auth import auth_blueprint
 from routes.issues import issues_blueprint
 from routes.models import models_blueprint
+from routes.metrics import metrics_blueprint
 
 app.register_blueprint(auth_blueprint, url_prefix="/api/auth")
 app.register_blueprint(issues_blueprint, url_prefix="/api/issues")
 app.register_blueprint(models_blueprint, url_prefix="/api/models")
-
-def run_background_task():
-    """ Periodically checks for new reports and categorizes them """
-    while True:
-        with app.app_context():
-            process_unsent_issues()
-            process_overdue_issues()
-        time.sleep(50)  
-
-threading.Thread(target=run_background_task, daemon=True).start()
+app.register_blueprint(metrics_blueprint, url_prefix="/api/metrics")
+
+def run_sweep(full=True):
+    """ Routes every unsent report; the periodic full sweep also handles overdue ones """
+    process_unsent_issues()
+    if full:
+        process_overdue_issues()
+        if Config.INCREMENTAL_TRAINING:
+            from ml.incremental import update_from_issues
+            update_from_issues()
+
+with app.app_context():
+    upgrade_schema()  # ✅ Bring older local_issues.db files up to the current models
+
+# ✅ New reports are routed as they arrive; run_sweep is only the safety net
+if Config.PIPELINE_ENABLED:
+    pipeline.start(app, process_ids=process_issue_ids, sweep=run_sweep)
 
 if __name__ == "__main__":
     with app.app_context():
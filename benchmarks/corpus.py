@@ -0,0 +1,91 @@
+"""Synthetic municipal-complaint corpora for the benchmarks.
+
+    python benchmarks/corpus.py --rows 100000 --output corpus.csv
+
+Rows are recombined from ``training dataset.csv``: a seed complaint with its
+city swapped and, sometimes, a clause from another complaint appended. The
+vocabulary therefore looks like real reports while every size up to 1M rows
+is reproducible from ``--seed``. Each row keeps the ID of the complaint it
+was built from as ``Template``, a stand-in label for ARI.
+"""
+import argparse
+import csv
+import os
+import random
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SEED_DATASET = os.path.join(ROOT, "training dataset.csv")
+
+CITIES = (
+    "Karachi", "Lahore", "Islamabad", "Rawalpindi", "Peshawar", "Quetta",
+    "Multan", "Faisalabad", "Hyderabad", "Sialkot", "Gujranwala", "Sukkur",
+)
+PREFIXES = ("", "", "", "Urgent: ", "Again, ", "Residents report that ", "For the third time, ")
+
+SIZE_SUFFIXES = {"k": 1000, "m": 1000000}
+
+
+def parse_size(text):
+    """'10k' -> 10000, '1M' -> 1000000, '2500' -> 2500."""
+    text = text.strip().lower()
+    if text[-1:] in SIZE_SUFFIXES:
+        return int(float(text[:-1]) * SIZE_SUFFIXES[text[-1]])
+    return int(text)
+
+
+def load_seed(path=SEED_DATASET):
+    """``(id, description)`` pairs of the seed complaints."""
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        reader = csv.DictReader(f)
+        column = "Description" if "Description" in reader.fieldnames else "DESC"
+        return [(int(row["ID"]), row[column].strip()) for row in reader if row[column].strip()]
+
+
+def _clauses(seed):
+    """Trailing clauses ("..., and police response is slow") that can be grafted onto other complaints."""
+    clauses = []
+    for _, description in seed:
+        head, sep, tail = description.rstrip(".").partition(", ")
+        if sep and len(tail.split()) >= 3:
+            clauses.append(tail)
+    return clauses
+
+
+def generate(rows, seed=0, seed_path=SEED_DATASET):
+    """Returns ``rows`` synthetic ``(template id, description)`` pairs."""
+    rng = random.Random(seed)
+    complaints = load_seed(seed_path)
+    clauses = _clauses(complaints)
+
+    corpus = []
+    for _ in range(rows):
+        template, description = rng.choice(complaints)
+        for city in CITIES:
+            if city in description:
+                description = description.replace(city, rng.choice(CITIES))
+        if clauses and rng.random() < 0.5:
+            description = f"{description.rstrip('.')}, and {rng.choice(clauses)}."
+        prefix = rng.choice(PREFIXES)
+        if prefix:
+            description = prefix + description[0].lower() + description[1:]
+        corpus.append((template, description))
+    return corpus
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", default="10k", help="e.g. 1k, 10k, 100k, 1M")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="corpus.csv")
+    args = parser.parse_args()
+
+    corpus = generate(parse_size(args.rows), args.seed)
+    with open(args.output, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["ID", "Description", "Template"])
+        writer.writerows((i, description, template) for i, (template, description) in enumerate(corpus, start=1))
+    print(f"✅ Wrote {len(corpus)} complaints to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
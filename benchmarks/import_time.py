@@ -0,0 +1,76 @@
+"""Cold-start import budget for the web app.
+
+    python benchmarks/import_time.py --budget-ms 1500
+
+Imports ``app`` in a fresh interpreter under ``python -X importtime`` and
+exits with status 1 if the import takes longer than the budget, or if any
+of the heavy ML/LLM packages is imported at start-up. Those must load on
+first use, so workers that only serve auth and issue traffic never pay for
+them. The best of ``--repeat`` runs is used to smooth out noise.
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+DEFAULT_BUDGET_MS = 1500
+LAZY_PACKAGES = ("numpy", "scipy", "pandas", "sklearn", "joblib", "groq", "openpyxl", "pyarrow", "matplotlib")
+
+
+def measure(module):
+    """Runs one cold import of ``module``; returns {top-level package: cumulative µs} plus the total."""
+    env = dict(os.environ, PIPELINE_ENABLED="0", PYTHONDONTWRITEBYTECODE="1")
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT, env=env, capture_output=True, text=True,
+    )
+    if completed.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{completed.stderr[-2000:]}")
+
+    packages, total = {}, None
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = (part.strip() for part in line[len("import time:"):].split("|"))
+        if not cumulative.isdigit():
+            continue  # Header line
+        package = name.split(".")[0]
+        packages[package] = max(packages.get(package, 0), int(cumulative))
+        if name == module:
+            total = int(cumulative)
+    return total, packages
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--module", default="app")
+    parser.add_argument("--budget-ms", type=float, default=DEFAULT_BUDGET_MS)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--top", type=int, default=10, help="Slowest top-level packages to list")
+    args = parser.parse_args()
+
+    runs = [measure(args.module) for _ in range(args.repeat)]
+    total, packages = min(runs, key=lambda run: run[0])
+
+    print(f"import {args.module}: {total / 1000:.1f} ms (budget {args.budget_ms:.0f} ms, best of {args.repeat})")
+    for package, cumulative in sorted(packages.items(), key=lambda item: -item[1])[:args.top]:
+        print(f"  {package:<24} {cumulative / 1000:8.1f} ms")
+
+    failures = []
+    if total / 1000 > args.budget_ms:
+        failures.append(f"cold import took {total / 1000:.1f} ms, over the {args.budget_ms:.0f} ms budget")
+    eager = [package for package in LAZY_PACKAGES if package in packages]
+    if eager:
+        failures.append(f"imported at start-up but should load lazily: {', '.join(eager)}")
+
+    for failure in failures:
+        print(f"❌ {failure}")
+    if failures:
+        sys.exit(1)
+    print("✅ Import time within budget")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+"""Seeds a large Issue table and times the hot queries with and without indexes.
+
+    python benchmarks/issue_queries.py --rows 1000000 --unsent 1000
+
+Runs against a throw-away SQLite file, never instance/local_issues.db. The
+numbers to watch are the unsent-claim and overdue queries: with the indexes
+they should stay flat as --rows grows, i.e. O(due) instead of O(total).
+"""
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, select, text  # noqa: E402
+from models import db  # noqa: E402
+from models.issue import Issue, claimable_filter, escalation_due_filter, escalation_level_for  # noqa: E402
+from models.user import User  # noqa: F401,E402  (registers the user table for the foreign key)
+from routes.cache.config import Config  # noqa: E402
+
+ESCALATION_TIERS_DAYS = Config.ESCALATION_TIERS_DAYS
+SEED_CHUNK = 50000
+
+
+def hot_queries(user_id, batch_size):
+    """The statements the sweep, the overdue check and /user-reports run."""
+    now = datetime.utcnow()
+    return {
+        "claim unsent": (
+            select(Issue.id).where(*claimable_filter(now)).order_by(Issue.id).limit(batch_size)
+        ),
+        "escalation due": (
+            select(Issue.id, Issue.description, Issue.department, Issue.status, Issue.created_at)
+            .where(*escalation_due_filter(now, ESCALATION_TIERS_DAYS))
+        ),
+        "user reports": (
+            select(Issue.id, Issue.description, Issue.department)
+            .where(Issue.user_id == user_id)
+            .order_by(Issue.id)
+        ),
+    }
+
+
+def seed(path, rows, unsent, pending, users, seed_value):
+    """Bulk-loads ``rows`` issues: the newest ``unsent`` are unrouted, ``pending`` are still open.
+
+    Open issues are already escalated up to their age, except one in a hundred
+    which is due for its next notice.
+    """
+    rng = random.Random(seed_value)
+    now = datetime.utcnow()
+    connection = sqlite3.connect(path)
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute("PRAGMA synchronous=OFF")
+    connection.executemany(
+        "INSERT INTO user (id, email, password_hash, user_type) VALUES (?, ?, 'x', 'simple')",
+        ((i, f"user{i}@example.com") for i in range(1, users + 1)),
+    )
+    pending_ids = set(rng.sample(range(1, rows + 1), min(pending, rows)))
+    for start in range(1, rows + 1, SEED_CHUNK):
+        stop = min(start + SEED_CHUNK, rows + 1)
+        connection.executemany(
+            "INSERT INTO issue (id, description, status, user_id, department, sent_to_department, created_at,"
+            " escalation_level, routing_attempts) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (_seed_row(i, rows, unsent, pending_ids, users, now, rng) for i in range(start, stop)),
+        )
+        connection.commit()
+    connection.close()
+
+
+def _seed_row(i, rows, unsent, pending_ids, users, now, rng):
+    # Oldest first, spread over two years
+    created_at = now - timedelta(minutes=(rows - i) * 1051200 // rows)
+    pending = i in pending_ids or i > rows - unsent
+    level = escalation_level_for(created_at, now, ESCALATION_TIERS_DAYS) if pending else 0
+    if level and rng.random() < 0.01:
+        level -= 1
+    return (
+        i,
+        f"issue {i}",
+        "Pending" if pending else "Resolved",
+        rng.randint(1, users),
+        None if i > rows - unsent else "Public Works Department",
+        0 if i > rows - unsent else 1,
+        created_at.strftime("%Y-%m-%d %H:%M:%S.%f"),
+        level,
+        0,
+    )
+
+
+def measure(engine, queries, repeat):
+    results = {}
+    with engine.connect() as connection:
+        for name, statement in queries.items():
+            timings = []
+            for _ in range(repeat):
+                started = time.perf_counter()
+                returned = len(connection.execute(statement).all())
+                timings.append(time.perf_counter() - started)
+            compiled = statement.compile(engine, compile_kwargs={"literal_binds": True})
+            plan = connection.execute(text(f"EXPLAIN QUERY PLAN {compiled}")).all()
+            results[name] = {
+                "best_ms": min(timings) * 1000,
+                "rows": returned,
+                "plan": "; ".join(row[-1] for row in plan),
+            }
+    return results
+
+
+def report(label, results):
+    print(f"\n{label}")
+    for name, result in results.items():
+        print(f"  {name:<16} {result['best_ms']:10.2f} ms  {result['rows']:>8} rows  {result['plan']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--unsent", type=int, default=1000, help="Issues still waiting to be routed")
+    parser.add_argument("--pending", type=int, default=20000, help="Routed issues still in Pending status")
+    parser.add_argument("--users", type=int, default=10000)
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--db", help="SQLite file to create (default: a temporary file)")
+    args = parser.parse_args()
+
+    path = args.db or os.path.join(tempfile.mkdtemp(prefix="issue-bench-"), "issues.db")
+    if os.path.exists(path):
+        os.remove(path)
+    engine = create_engine(f"sqlite:///{path}")
+
+    # ✅ Start from the pre-index schema so the first run is the "before" number
+    db.metadata.create_all(engine)
+    with engine.begin() as connection:
+        for index in Issue.__table__.indexes:
+            index.drop(connection)
+
+    started = time.perf_counter()
+    seed(path, args.rows, args.unsent, args.pending, args.users, args.seed)
+    print(f"Seeded {args.rows} issues into {path} in {time.perf_counter() - started:.1f}s")
+
+    queries = hot_queries(user_id=1, batch_size=args.batch_size)
+    with engine.begin() as connection:
+        connection.execute(text("ANALYZE"))
+    before = measure(engine, queries, args.repeat)
+    report("Without indexes", before)
+
+    started = time.perf_counter()
+    with engine.begin() as connection:
+        for index in Issue.__table__.indexes:
+            index.create(connection)
+        connection.execute(text("ANALYZE"))
+    print(f"\nBuilt indexes in {time.perf_counter() - started:.1f}s")
+    after = measure(engine, queries, args.repeat)
+    report("With indexes", after)
+
+    print("\nSpeed-up")
+    for name in queries:
+        print(f"  {name:<16} {before[name]['best_ms'] / max(after[name]['best_ms'], 1e-6):8.1f}x")
+
+    engine.dispose()
+    if not args.db:
+        os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
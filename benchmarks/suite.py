@@ -0,0 +1,410 @@
+"""Throughput and peak-memory benchmarks for classification, metrics, training and the routing sweep.
+
+    python benchmarks/suite.py --sizes 1k,10k,100k,1M --output results.json
+    python benchmarks/suite.py --sizes 10k --compare baseline.json
+    python benchmarks/suite.py --compare baseline.json --current results.json
+
+Every benchmark runs on synthetic corpora from benchmarks/corpus.py:
+
+* classify   vectorize + predict departments per model (what bulk uploads
+             and the local routing tier do)
+* metrics    each metric /api/models/test computes, on the kmeans labelling
+* training   ml.training.train per algorithm, as a training job runs it
+* pipeline   process_unsent_issues on an in-memory SQLite database, with a
+             stub LLM client and an SMTP dispatcher that discards mail
+
+Results are written as JSON. --compare matches cases against a baseline file
+and exits with status 1 when one got slower or hungrier than --threshold.
+Algorithms whose cost grows quadratically are skipped above MAX_ROWS.
+"""
+import argparse
+import contextlib
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.corpus import ROOT, generate, parse_size  # noqa: E402
+
+DEFAULT_SIZES = "1k,10k,100k,1M"
+DEFAULT_THRESHOLD = 0.10  # Relative slow-down (or memory growth) reported as a regression
+NOISE_SECONDS = 0.01  # Slow-downs smaller than this are timer noise, whatever their percentage
+BENCHMARKS = ("classify", "metrics", "training", "pipeline")
+TRAIN_SAMPLE_ROWS = 10000  # Models used by classify/metrics/pipeline are fitted on this many rows
+
+MODEL_HYPERPARAMETERS = {
+    "kmeans": {"n_clusters": "5"},
+    "dbscan": {"eps": "1.0", "min_samples": "5"},
+    "hierarchical": {"n_clusters": "5"},
+}
+
+# Largest corpus each case runs on; DBSCAN and agglomerative fits are quadratic in rows
+MAX_ROWS = {
+    ("training", "dbscan"): 100000,
+    ("training", "hierarchical"): 20000,
+    ("pipeline", "process_unsent_issues"): 100000,
+}
+
+
+class Measurement:
+    """Wall time and peak traced memory of the code run inside ``with Measurement(...) as m``."""
+
+    def __init__(self, trace_memory):
+        self.trace_memory = trace_memory
+        self.seconds = None
+        self.peak_mb = None
+
+    def __enter__(self):
+        if self.trace_memory:
+            tracemalloc.start()
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.seconds = time.perf_counter() - self._started
+        if self.trace_memory:
+            self.peak_mb = tracemalloc.get_traced_memory()[1] / 2 ** 20
+            tracemalloc.stop()
+        return False
+
+
+def result(benchmark, case, rows, measurement, **extra):
+    return {
+        "benchmark": benchmark,
+        "case": case,
+        "rows": rows,
+        "seconds": round(measurement.seconds, 4),
+        "rows_per_second": round(rows / measurement.seconds, 1) if measurement.seconds else None,
+        "peak_mb": round(measurement.peak_mb, 2) if measurement.peak_mb is not None else None,
+        **extra,
+    }
+
+
+def skipped(benchmark, case, rows, reason):
+    return {"benchmark": benchmark, "case": case, "rows": rows, "skipped": reason}
+
+
+def _frame(corpus):
+    import pandas as pd
+
+    return pd.DataFrame({
+        "Description": [description for _, description in corpus],
+        "Template": [template for template, _ in corpus],
+    })
+
+
+def fit_models(corpus, folder):
+    """Trains every algorithm on a sample and saves it to ``folder``; returns {name: ModelBundle}."""
+    from ml.registry import ModelBundle
+    from ml.training import save_artifacts, train
+
+    frame = _frame(corpus[:TRAIN_SAMPLE_ROWS])
+    bundles = {}
+    for name, hyperparameters in MODEL_HYPERPARAMETERS.items():
+        trained = train(frame, name, hyperparameters)
+        save_artifacts(trained, folder=folder)
+        bundles[name] = ModelBundle(name, trained["model"], trained["vectorizer"], None, trained["table"])
+    return bundles
+
+
+def bench_classify(corpus, bundles, trace_memory):
+    from ml.inference import DEFAULT_CHUNK_SIZE, chunked, predict_departments
+
+    descriptions = [description for _, description in corpus]
+    for name, bundle in bundles.items():
+        with Measurement(trace_memory) as m:
+            for chunk in chunked(descriptions, DEFAULT_CHUNK_SIZE):
+                predict_departments(bundle, bundle.vectorizer.transform(chunk))
+        yield result("classify", name, len(corpus), m)
+
+
+def bench_metrics(corpus, bundles, trace_memory):
+    from sklearn.metrics import adjusted_rand_score
+    from ml.inference import predict_clusters
+    from ml.metrics import iter_cluster_metrics
+    from routes.cache.config import Config
+
+    bundle = bundles["kmeans"]
+    X = bundle.vectorizer.transform([description for _, description in corpus])
+    labels = predict_clusters(bundle.model, X, bundle.table)
+
+    # ✅ Same settings as /api/models/test; each metric is timed on its own
+    metrics = iter_cluster_metrics(
+        X, labels,
+        memory_budget_mb=Config.METRICS_MEMORY_BUDGET_MB,
+        silhouette_sample_size=Config.METRICS_SILHOUETTE_SAMPLE_SIZE,
+        dunn_exact_max_rows=Config.METRICS_DUNN_EXACT_MAX_ROWS,
+    )
+    while True:
+        with Measurement(trace_memory) as m:
+            metric = next(metrics, None)
+        if metric is None:
+            break
+        yield result("metrics", metric[0], len(corpus), m)
+
+    with Measurement(trace_memory) as m:
+        adjusted_rand_score([template for template, _ in corpus], labels)
+    yield result("metrics", "adjusted_rand", len(corpus), m)
+
+
+def bench_training(corpus, trace_memory):
+    from ml.training import train
+
+    frame = _frame(corpus)
+    for name, hyperparameters in MODEL_HYPERPARAMETERS.items():
+        limit = MAX_ROWS.get(("training", name))
+        if limit is not None and len(corpus) > limit:
+            yield skipped("training", name, len(corpus), f"more than {limit} rows")
+            continue
+        with Measurement(trace_memory) as m:
+            trained = train(frame, name, hyperparameters)
+        yield result("training", name, len(corpus), m, n_clusters=trained["diagnostics"]["n_clusters"])
+
+
+class StubLLMClient:
+    """Answers like the Groq client from department keywords, after ``latency`` seconds."""
+
+    KEYWORDS = (
+        ("school", "Education Department"),
+        ("student", "Education Department"),
+        ("hospital", "Health Department"),
+        ("patient", "Health Department"),
+        ("traffic", "Traffic Police Department"),
+        ("road", "Public Works Department"),
+        ("sewage", "Public Works Department"),
+        ("water", "Public Works Department"),
+    )
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.chat = self
+        self.completions = self
+
+    def create(self, messages, model=None, timeout=None):
+        from types import SimpleNamespace
+
+        if self.latency:
+            time.sleep(self.latency)
+        text = messages[-1]["content"].lower()
+        department = next((name for keyword, name in self.KEYWORDS if keyword in text), "Police Department")
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=department))])
+
+
+class _NullSMTP:
+    def send_message(self, msg):
+        pass
+
+    def noop(self):
+        return (250, b"OK")
+
+    def quit(self):
+        pass
+
+
+def _null_dispatcher():
+    """A MailDispatcher whose sessions discard mail, so pooling and threading are still measured."""
+    from routes.cache import mailer
+
+    class NullDispatcher(mailer.MailDispatcher):
+        def _connect(self):
+            return mailer._Session(_NullSMTP())
+
+    return NullDispatcher.from_config()
+
+
+def bench_pipeline(corpus, model_folder, trace_memory, llm_latency):
+    from flask import Flask
+    from sqlalchemy import insert
+    from sqlalchemy.pool import StaticPool
+    from ml.registry import registry
+    from models import db
+    from models.issue import Issue
+    from models.ml_model import MLModel  # noqa: F401  (get_selected_model reads this table)
+    from models.user import User
+    from routes.cache import email, mailer
+    from routes.cache.config import Config
+
+    limit = MAX_ROWS[("pipeline", "process_unsent_issues")]
+    if len(corpus) > limit:
+        yield skipped("pipeline", "process_unsent_issues", len(corpus), f"more than {limit} rows")
+        return
+
+    app = Flask(__name__)
+    app.config.update(
+        SQLALCHEMY_DATABASE_URI="sqlite://",
+        SQLALCHEMY_ENGINE_OPTIONS={"poolclass": StaticPool, "connect_args": {"check_same_thread": False}},
+    )
+    db.init_app(app)
+
+    # ✅ Stub the network edges only: the routing engine, local tier, mail pool and DB code all run for real
+    Config.ROUTING_CACHE_ENABLED = False
+    Config.ROUTING_REQUESTS_PER_SECOND = 1e9
+    email.client = StubLLMClient(llm_latency)
+    email._routing_engine = None
+    mailer._dispatcher = _null_dispatcher()
+    registry.folder = model_folder
+    registry.active_model = None
+    registry.invalidate()
+
+    with app.app_context():
+        db.create_all()
+        db.session.add(User(id=1, email="bench@example.com", password_hash="x", user_type="simple"))
+        now = datetime.utcnow()
+        db.session.execute(insert(Issue), [
+            {"description": description, "user_id": 1, "status": "Pending", "sent_to_department": False, "created_at": now}
+            for _, description in corpus
+        ])
+        db.session.commit()
+
+        stats_before = email.routing_stats.snapshot()["counts"]
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            with Measurement(trace_memory) as m:
+                email.process_unsent_issues()
+        stats = email.routing_stats.snapshot()["counts"]
+        sent = Issue.query.filter_by(sent_to_department=True).count()
+        db.drop_all()
+
+    yield result(
+        "pipeline", "process_unsent_issues", len(corpus), m,
+        sent=sent,
+        local=stats["local"] - stats_before["local"],
+        llm=stats["llm"] - stats_before["llm"],
+    )
+
+
+def git_version():
+    try:
+        completed = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True)
+    except OSError:
+        return None
+    return completed.stdout.strip() or None
+
+
+def run_suite(sizes, benchmarks, seed, trace_memory, llm_latency):
+    corpus = generate(max(sizes + [TRAIN_SAMPLE_ROWS]), seed)
+    model_folder = tempfile.mkdtemp(prefix="bench-models-")
+    results = []
+    try:
+        print(f"Fitting benchmark models on {TRAIN_SAMPLE_ROWS} rows...")
+        bundles = fit_models(corpus, model_folder)
+
+        for rows in sizes:
+            sample = corpus[:rows]
+            runs = {
+                "classify": lambda: bench_classify(sample, bundles, trace_memory),
+                "metrics": lambda: bench_metrics(sample, bundles, trace_memory),
+                "training": lambda: bench_training(sample, trace_memory),
+                "pipeline": lambda: bench_pipeline(sample, model_folder, trace_memory, llm_latency),
+            }
+            for benchmark in benchmarks:
+                for entry in runs[benchmark]():
+                    report(entry)
+                    results.append(entry)
+    finally:
+        shutil.rmtree(model_folder, ignore_errors=True)
+
+    return {
+        "version": git_version(),
+        "created_at": datetime.utcnow().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "seed": seed,
+        "memory_traced": trace_memory,
+        "results": results,
+    }
+
+
+def report(entry):
+    label = f"{entry['benchmark']}/{entry['case']}"
+    if "skipped" in entry:
+        print(f"  {label:<32} {entry['rows']:>8} rows  skipped ({entry['skipped']})")
+        return
+    peak = f"{entry['peak_mb']:9.1f} MB" if entry["peak_mb"] is not None else ""
+    print(f"  {label:<32} {entry['rows']:>8} rows  {entry['seconds']:9.3f} s  {entry['rows_per_second']:>12,.0f} rows/s {peak}")
+
+
+def _change(before, after):
+    if not before or after is None:
+        return None
+    return (after - before) / before
+
+
+def _format_change(change):
+    """'+12.5%', or 'n/a' when the baseline was too small (e.g. rounded to 0.0 s) to compare against."""
+    return f"{change:+7.1%}" if change is not None else f"{'n/a':>7}"
+
+
+def compare(baseline, current, threshold):
+    """Prints every case present in both runs; returns the list of regressions."""
+    def key(entry):
+        return entry["benchmark"], entry["case"], entry["rows"]
+
+    previous = {key(entry): entry for entry in baseline["results"] if "skipped" not in entry}
+    regressions = []
+    print(f"\nComparing {current.get('version')} against {baseline.get('version')} (threshold {threshold:.0%})")
+    for entry in current["results"]:
+        before = previous.get(key(entry))
+        if before is None or "skipped" in entry:
+            continue
+        time_change = _change(before["seconds"], entry["seconds"])
+        memory_change = _change(before.get("peak_mb"), entry.get("peak_mb"))
+        slower = (time_change or 0) > threshold and entry["seconds"] - before["seconds"] > NOISE_SECONDS
+        regressed = slower or (memory_change or 0) > threshold
+        memory = f"  peak {_format_change(memory_change)}" if entry.get("peak_mb") is not None else ""
+        flag = "❌" if regressed else "✅"
+        print(f"  {flag} {entry['benchmark'] + '/' + entry['case']:<32} {entry['rows']:>8} rows  "
+              f"{before['seconds']:9.3f} s -> {entry['seconds']:9.3f} s  {_format_change(time_change)}{memory}")
+        if regressed:
+            regressions.append(entry)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default=DEFAULT_SIZES, help="Corpus sizes, e.g. 1k,10k,100k,1M")
+    parser.add_argument("--only", default=",".join(BENCHMARKS), help=f"Subset of: {', '.join(BENCHMARKS)}")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write the results JSON here")
+    parser.add_argument("--no-memory", action="store_true", help="Skip tracemalloc (faster, no peak_mb)")
+    parser.add_argument("--llm-latency-ms", type=float, default=0.0, help="Simulated latency of each stub LLM call")
+    parser.add_argument("--compare", metavar="BASELINE", help="Results JSON to compare against")
+    parser.add_argument("--current", help="With --compare: compare this results JSON instead of running the suite")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    args = parser.parse_args()
+
+    if args.current:
+        with open(args.current) as f:
+            current = json.load(f)
+    else:
+        benchmarks = [name.strip() for name in args.only.split(",") if name.strip()]
+        unknown = sorted(set(benchmarks) - set(BENCHMARKS))
+        if unknown:
+            parser.error(f"unknown benchmarks: {', '.join(unknown)}")
+        sizes = [parse_size(size) for size in args.sizes.split(",") if size.strip()]
+        current = run_suite(sizes, benchmarks, args.seed, not args.no_memory, args.llm_latency_ms / 1000)
+        if args.output:
+            with open(args.output, "w") as f:
+                json.dump(current, f, indent=1)
+            print(f"✅ Results written to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(baseline, current, args.threshold)
+        if regressions:
+            print(f"❌ {len(regressions)} regression(s) above {args.threshold:.0%}")
+            sys.exit(1)
+        print("✅ No regressions")
+
+
+if __name__ == "__main__":
+    main()
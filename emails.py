@@ -1,26 +1,16 @@
-import os
-import joblib
-import smtplib
-import pandas as pd
 from email.message import EmailMessage
-from models.issue import Issue
+from models.issue import iter_claimed_issue_batches, complete_claimed_issues
 from models.ml_model import MLModel  
-from models import db
+from ml.registry import registry
+from ml.inference import classify_batch, classify_with_confidence, DEFAULT_CHUNK_SIZE, UNRECOGNIZED_DEPARTMENT
+from routes.cache.mailer import get_dispatcher
 
-MODEL_FOLDER = "mlmodels"
-
-SMTP_SERVER = "sandbox.smtp.mailtrap.io"
-SMTP_PORT = "2525"
-EMAIL_USERNAME = "ed2401c6fea2db"
-EMAIL_PASSWORD = "e85f9de532580a"
 EMAIL_SENDER = "noreply@yourapp.com"
 
 def load_model(model_name):
-    """Loads a trained ML model from the mlmodels folder."""
-    model_path = os.path.join(MODEL_FOLDER, f"{model_name.lower()}_model.pkl")
-    if os.path.exists(model_path):
-        return joblib.load(model_path)
-    return None
+    """Returns a trained ML model from the in-memory model registry."""
+    bundle = registry.get(model_name)
+    return bundle.model if bundle else None
 
 def get_selected_model():
     """Fetches the currently selected ML model from the database."""
@@ -29,38 +19,36 @@ def get_selected_model():
 
 def classify_issue_with_ml(issue_description):
     """Classifies the issue description using the currently selected ML model."""
-    model_name = get_selected_model()
-    model = load_model(model_name)
-    
-    if model is None:
-        return "Unrecognized department" 
-    
+    return classify_issues_with_ml([issue_description])[0]
+
+def classify_issues_with_ml(issue_descriptions):
+    """Classifies a batch of issue descriptions with one vectorize/predict pass per chunk."""
+    if registry.active_model is None:
+        registry.activate(get_selected_model())
+
     try:
-        from sklearn.feature_extraction.text import TfidfVectorizer
-        tfidf = TfidfVectorizer(max_features=1000)
-        X_test = tfidf.fit_transform([issue_description])
+        return classify_batch(issue_descriptions)
 
-        prediction = model.predict(X_test.toarray())[0]
+    except Exception as e:
+        print(f"❌ Error classifying issues: {e}")
+        return [UNRECOGNIZED_DEPARTMENT] * len(issue_descriptions)
 
-        department_mapping = {
-            0: "Police Department",
-            1: "Health Department",
-            2: "Education Department",
-            3: "Public Works Department",
-            4: "Municipal Committee"
-        }
+def classify_issues_with_confidence(issue_descriptions):
+    """Like ``classify_issues_with_ml`` but returns ``(department, confidence)`` pairs."""
+    if registry.active_model is None:
+        registry.activate(get_selected_model())
 
-        return department_mapping.get(prediction, "Unrecognized department")
+    try:
+        return classify_with_confidence(issue_descriptions)
 
     except Exception as e:
-        print(f"❌ Error classifying issue: {e}")
-        return "Unrecognized department"
+        print(f"❌ Error classifying issues: {e}")
+        return [(UNRECOGNIZED_DEPARTMENT, 0.0)] * len(issue_descriptions)
 
-def send_email(issue):
-    """Sends an email with issue details to the assigned department."""
-    try:
-        subject = f"New Issue Report - {issue.department}"
-        body = f"""
+def build_issue_email(issue):
+    """Builds the email with issue details for the assigned department."""
+    subject = f"New Issue Report - {issue.department}"
+    body = f"""
         🚨 New Issue Report 🚨
         ---------------------------------
         📌 Report ID: {issue.id}
@@ -71,44 +59,51 @@ def send_email(issue):
         Please take action accordingly.
         """
 
-        msg = EmailMessage()
-        msg.set_content(body)
-        msg["Subject"] = subject
-        msg["From"] = EMAIL_SENDER
-        msg["To"] = "trendbussiness.3915@gmail.com"  
-
-        server = smtplib.SMTP(SMTP_SERVER, SMTP_PORT)
-        server.starttls()  
-        server.login(EMAIL_USERNAME, EMAIL_PASSWORD)  
-        server.send_message(msg)
-        server.quit()
+    msg = EmailMessage()
+    msg.set_content(body)
+    msg["Subject"] = subject
+    msg["From"] = EMAIL_SENDER
+    msg["To"] = "trendbussiness.3915@gmail.com"  
+    return msg
 
+def send_email(issue):
+    """Sends an email with issue details to the assigned department."""
+    if get_dispatcher().send(build_issue_email(issue)):
         print(f"📧 Email sent successfully for Report ID {issue.id} to {issue.department}")
         return True
 
-    except Exception as e:
-        print(f"❌ Failed to send email for Report ID {issue.id}: {e}")
-        return False
+    print(f"❌ Failed to send email for Report ID {issue.id}")
+    return False
 
-def process_unsent_issues():
+def process_unsent_issues(batch_size=DEFAULT_CHUNK_SIZE):
     """Fetch and categorize unsent reports using the selected ML model, then send email notifications."""
-    unsent_issues = Issue.query.filter_by(sent_to_department=False).all()
+    # Pick up a selection made by another worker once per sweep, not once per issue
+    registry.activate(get_selected_model())
 
-    if not unsent_issues:
-        print("✅ No new reports to process.")
-        return "No new reports to process."
+    processed = 0
+    for unsent_issues in iter_claimed_issue_batches(batch_size):
+        unclassified = [issue for issue in unsent_issues if not issue.department]
+        departments = classify_issues_with_ml([issue.description for issue in unclassified]) if unclassified else []
+
+        for issue, assigned_department in zip(unclassified, departments):
+            issue.department = assigned_department
 
-    for issue in unsent_issues:
+        sent = get_dispatcher().send_many([build_issue_email(issue) for issue in unsent_issues])
 
-        assigned_department = classify_issue_with_ml(issue.description)
+        for issue, was_sent in zip(unsent_issues, sent):
+            issue.sent_to_department = was_sent
 
-        issue.department = assigned_department
-        issue.sent_to_department = send_email(issue)
-        db.session.commit()
+            if issue.sent_to_department:
+                print(f"🚀 Report ID {issue.id} sent to {issue.department} department via email.")
+            else:
+                print(f"❌ Email failed for Report ID {issue.id}, but department is assigned.")
 
-        if issue.sent_to_department:
-            print(f"🚀 Report ID {issue.id} sent to {assigned_department} department via email.")
-        else:
-            print(f"❌ Email failed for Report ID {issue.id}, but department is assigned.")
+        complete_claimed_issues(unsent_issues)  # ✅ One commit per batch
+
+        processed += len(unsent_issues)
+
+    if not processed:
+        print("✅ No new reports to process.")
+        return "No new reports to process."
 
-    return f"✅ {len(unsent_issues)} reports processed."
+    return f"✅ {processed} reports processed."
@@ -0,0 +1,284 @@
+"""Versioned on-disk bundles of a trained model and its vectorizer.
+
+A bundle is a folder holding ``manifest.json`` plus one ``.npy`` file per
+array (TF-IDF terms and IDF weights, cluster centres, labels, ...). Arrays
+load with ``mmap_mode="r"``, so every worker process shares one page-cached
+copy and a cold load only parses the manifest. Data files are named after
+their content hash and the manifest is replaced last, so readers never see
+a half-written bundle. Objects that cannot be described by parameters and
+arrays are stored as an uncompressed joblib pickle inside the bundle.
+"""
+import hashlib
+import importlib
+import json
+import os
+import time
+
+import joblib
+import numpy as np
+
+SCHEMA_VERSION = 1
+MANIFEST_FILE = "manifest.json"
+BUNDLE_SUFFIX = "_bundle"
+
+ESTIMATOR_MODULE_PREFIX = "sklearn."  # Only these classes are re-created from a manifest
+JSON_SCALARS = (bool, int, float, str, type(None))
+
+
+def bundle_dir(folder, name):
+    return os.path.join(folder, f"{name.lower()}{BUNDLE_SUFFIX}")
+
+
+def _sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class _BundleWriter:
+    """Collects the data files of one bundle; each is named after its content hash."""
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.files = {}
+        self.sizes = {}
+
+    def _publish(self, tmp_path, prefix, extension):
+        digest = _sha256(tmp_path)
+        filename = f"{prefix}-{digest[:16]}{extension}"
+        os.replace(tmp_path, os.path.join(self.directory, filename))
+        self.files[filename] = digest
+        self.sizes[filename] = os.path.getsize(os.path.join(self.directory, filename))
+        return filename
+
+    def array(self, prefix, value):
+        tmp_path = os.path.join(self.directory, f".{prefix}.{os.getpid()}.tmp.npy")
+        np.save(tmp_path, np.ascontiguousarray(value), allow_pickle=False)
+        return self._publish(tmp_path, prefix, ".npy")
+
+    def pickle(self, prefix, obj):
+        tmp_path = os.path.join(self.directory, f".{prefix}.{os.getpid()}.tmp.pkl")
+        joblib.dump(obj, tmp_path)  # Uncompressed, so its arrays can still be memory-mapped
+        return self._publish(tmp_path, prefix, ".pkl")
+
+
+def _json_value(value):
+    """``value`` as JSON, or raises TypeError when it has no faithful JSON form."""
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, JSON_SCALARS):
+        return value
+    if isinstance(value, (list, tuple)) and all(isinstance(item, JSON_SCALARS) for item in value):
+        return {"tuple": list(value)} if isinstance(value, tuple) else list(value)
+    raise TypeError(type(value).__name__)
+
+
+def _python_value(value):
+    if isinstance(value, dict) and set(value) == {"tuple"}:
+        return tuple(value["tuple"])
+    return value
+
+
+def _describe_vectorizer(vectorizer, writer):
+    from sklearn.feature_extraction.text import TfidfVectorizer
+
+    if type(vectorizer) is not TfidfVectorizer:
+        raise TypeError(type(vectorizer).__name__)
+    params = vectorizer.get_params()
+    params["dtype"] = np.dtype(params["dtype"]).name
+    if any(callable(value) for value in params.values()):
+        raise TypeError("callable parameter")  # Custom tokenizers and analyzers need the pickle
+
+    # Column order is the vocabulary index order, so terms[i] is feature i
+    terms = np.empty(len(vectorizer.vocabulary_), dtype=object)
+    for term, index in vectorizer.vocabulary_.items():
+        terms[index] = term
+    return {
+        "format": "tfidf",
+        "params": {key: _json_value(value) for key, value in params.items()},
+        "arrays": {
+            "terms": writer.array("vectorizer-terms", terms.astype(str)),
+            "idf": writer.array("vectorizer-idf", vectorizer.idf_),
+        },
+    }
+
+
+def _describe_estimator(model, writer):
+    cls = type(model)
+    if not cls.__module__.startswith(ESTIMATOR_MODULE_PREFIX):
+        raise TypeError(cls.__name__)
+
+    params = model.get_params(deep=False)
+    attributes, arrays = {}, {}
+    for key, value in vars(model).items():
+        if key in params:
+            continue
+        if isinstance(value, np.ndarray):
+            if value.dtype.kind not in "biuf":
+                raise TypeError(f"{key} has dtype {value.dtype}")
+            arrays[key] = writer.array(f"model-{key.strip('_')}", value)
+        else:
+            attributes[key] = _json_value(value)
+    return {
+        "format": "estimator",
+        "class": f"{cls.__module__}.{cls.__qualname__}",
+        "params": {key: _json_value(value) for key, value in params.items()},
+        "attributes": attributes,
+        "arrays": arrays,
+    }
+
+
+def _describe_table(table, writer):
+    return {
+        "format": "centroids",
+        "departments": [str(department) for department in table.departments],
+        "votes": [int(votes) for votes in table.votes],
+        "arrays": {
+            "clusters": writer.array("labels-clusters", table.clusters),
+            "centroids": writer.array("labels-centroids", table.centroids),
+        },
+    }
+
+
+def _describe(kind, obj, describe, writer):
+    """``describe(obj)``, falling back to a pickle for objects it cannot represent."""
+    if obj is None:
+        return None
+    try:
+        return describe(obj, writer)
+    except TypeError:
+        return {"format": "pickle", "file": writer.pickle(kind, obj)}
+
+
+def save_bundle(name, model, vectorizer, folder, table=None):
+    """Writes ``model``, ``vectorizer`` and the optional centroid ``table`` as the bundle for ``name``.
+
+    Returns the bundle folder.
+    """
+    directory = bundle_dir(folder, name)
+    os.makedirs(directory, exist_ok=True)
+    writer = _BundleWriter(directory)
+    started = time.time()
+
+    manifest = {
+        "schema_version": SCHEMA_VERSION,
+        "name": name.lower(),
+        "created_at": time.time(),
+        "model": _describe("model", model, _describe_estimator, writer),
+        "vectorizer": _describe("vectorizer", vectorizer, _describe_vectorizer, writer),
+        "labels": _describe_table(table, writer) if table is not None else None,
+        "files": writer.files,
+        "sizes": writer.sizes,
+    }
+
+    tmp_path = os.path.join(directory, f".{MANIFEST_FILE}.{os.getpid()}.tmp")
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f, indent=1)
+    os.replace(tmp_path, os.path.join(directory, MANIFEST_FILE))
+
+    # Files of older versions; processes that still map them keep their copy. Files newer
+    # than this save belong to a concurrent save of the same model and are left alone.
+    for filename in os.listdir(directory):
+        if filename == MANIFEST_FILE or filename in writer.files or filename.startswith("."):
+            continue
+        try:
+            path = os.path.join(directory, filename)
+            if os.path.getmtime(path) < started:
+                os.remove(path)
+        except OSError:
+            pass
+    return directory
+
+
+def read_manifest(directory):
+    with open(os.path.join(directory, MANIFEST_FILE)) as f:
+        manifest = json.load(f)
+    if manifest.get("schema_version") != SCHEMA_VERSION:
+        raise ValueError(f"Unsupported artifact schema version {manifest.get('schema_version')}")
+    return manifest
+
+
+def verify_bundle(directory, manifest, check_hashes=False):
+    """Raises ValueError if a data file is missing or does not match the manifest.
+
+    By default only file sizes are compared, which costs one ``stat`` per
+    file; ``check_hashes`` reads and hashes every file instead.
+    """
+    sizes = manifest.get("sizes", {})  # Absent from bundles written before sizes were recorded
+    for filename, digest in manifest["files"].items():
+        path = os.path.join(directory, filename)
+        try:
+            size = os.path.getsize(path)
+        except OSError:
+            raise ValueError(f"Artifact file {path} is missing")
+        if filename in sizes and size != sizes[filename]:
+            raise ValueError(f"Artifact file {path} is truncated or corrupt")
+        if check_hashes and _sha256(path) != digest:
+            raise ValueError(f"Artifact file {path} is corrupt")
+
+
+def _load_vectorizer(section, directory, mmap_mode):
+    from sklearn.feature_extraction.text import TfidfVectorizer
+
+    params = {key: _python_value(value) for key, value in section["params"].items()}
+    params["dtype"] = np.dtype(params["dtype"]).type
+    vectorizer = TfidfVectorizer(**params)
+    terms = np.load(os.path.join(directory, section["arrays"]["terms"]), mmap_mode=mmap_mode)
+    vectorizer.vocabulary_ = {term: index for index, term in enumerate(terms.tolist())}
+    vectorizer.fixed_vocabulary_ = False
+    vectorizer.idf_ = np.load(os.path.join(directory, section["arrays"]["idf"]), mmap_mode=mmap_mode)
+    return vectorizer
+
+
+def _load_estimator(section, directory, mmap_mode):
+    module_name, _, class_name = section["class"].rpartition(".")
+    if not module_name.startswith(ESTIMATOR_MODULE_PREFIX):
+        raise ValueError(f"Refusing to load estimator class {section['class']}")
+    cls = getattr(importlib.import_module(module_name), class_name)
+
+    model = cls(**{key: _python_value(value) for key, value in section["params"].items()})
+    for key, value in section["attributes"].items():
+        setattr(model, key, _python_value(value))
+    for key, filename in section["arrays"].items():
+        setattr(model, key, np.load(os.path.join(directory, filename), mmap_mode=mmap_mode))
+    return model
+
+
+def _load_section(section, directory, load, mmap_mode):
+    if section is None:
+        return None
+    if section["format"] == "pickle":
+        return joblib.load(os.path.join(directory, section["file"]), mmap_mode=mmap_mode)
+    return load(section, directory, mmap_mode)
+
+
+def load_centroid_table(directory, manifest, mmap_mode="r"):
+    """The bundle's ``CentroidTable`` of learned departments, or None for bundles saved without one.
+
+    Bundles from before votes were recorded load with none, i.e. as unlearned.
+    """
+    from ml.inference import CentroidTable
+
+    section = manifest.get("labels")
+    if section is None:
+        return None
+    clusters = np.load(os.path.join(directory, section["arrays"]["clusters"]), mmap_mode=mmap_mode)
+    centroids = np.load(os.path.join(directory, section["arrays"]["centroids"]), mmap_mode=mmap_mode)
+    return CentroidTable(clusters, centroids, section["departments"], section.get("votes"))
+
+
+def load_bundle(directory, mmap_mode="r", verify=True, check_hashes=False):
+    """Returns ``(model, vectorizer, manifest)`` from a bundle folder.
+
+    Raises ValueError for an unknown schema version or, with ``verify``, a
+    missing file or one whose size (with ``check_hashes``, also hash) does
+    not match the manifest.
+    """
+    manifest = read_manifest(directory)
+    if verify:
+        verify_bundle(directory, manifest, check_hashes)
+    model = _load_section(manifest["model"], directory, _load_estimator, mmap_mode)
+    vectorizer = _load_section(manifest["vectorizer"], directory, _load_vectorizer, mmap_mode)
+    return model, vectorizer, manifest
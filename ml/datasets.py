@@ -0,0 +1,107 @@
+import io
+import os
+
+TEXT_COLUMN = "Description"
+TEXT_COLUMN_ALIASES = ("DESC",)  # training dataset.csv uses ID,DESC
+DEFAULT_CHUNK_SIZE = 5000
+
+DATASET_FORMATS = {
+    ".xlsx": "xlsx",
+    ".csv": "csv",
+    ".parquet": "parquet",
+}
+
+
+def dataset_format(path):
+    """'xlsx', 'csv' or 'parquet' from the file extension; ValueError for anything else."""
+    extension = os.path.splitext(path)[1].lower()
+    if extension not in DATASET_FORMATS:
+        raise ValueError("Unsupported dataset format. Please upload a .xlsx, .csv or .parquet file")
+    return DATASET_FORMATS[extension]
+
+
+def iter_xlsx_sheet(source):
+    """Yields ``(row number, values)`` from the active sheet of ``source``, a path or binary stream.
+
+    Row 0 is the header, as strings; formatted-but-empty rows are skipped
+    without renumbering the rest. Shared by dataset loading and issue uploads.
+    """
+    from openpyxl import load_workbook
+
+    if not isinstance(source, (str, os.PathLike)) and not source.seekable():
+        source = io.BytesIO(source.read())
+    # ✅ read_only streams rows from the sheet XML instead of building the whole workbook in memory
+    workbook = load_workbook(source, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        yield 0, [str(value) if value is not None else "" for value in next(rows, ())]
+        for number, values in enumerate(rows, start=1):
+            if any(value is not None for value in values):
+                yield number, values
+    finally:
+        workbook.close()
+
+
+def _iter_xlsx(path, chunk_size):
+    import pandas as pd
+
+    rows = iter_xlsx_sheet(path)
+    _, header = next(rows)
+    chunk, yielded = [], False
+    for _, values in rows:
+        chunk.append(values[:len(header)])
+        if len(chunk) == chunk_size:
+            yield pd.DataFrame(chunk, columns=header)
+            chunk, yielded = [], True
+    if chunk or not yielded:
+        yield pd.DataFrame(chunk, columns=header)
+
+
+def _iter_csv(path, chunk_size):
+    import pandas as pd
+
+    yield from pd.read_csv(path, chunksize=chunk_size)
+
+
+def _iter_parquet(path, chunk_size):
+    import pyarrow.parquet as pq
+
+    parquet_file = pq.ParquetFile(path)
+    for batch in parquet_file.iter_batches(batch_size=chunk_size):
+        yield batch.to_pandas()
+
+
+FRAME_READERS = {
+    "xlsx": _iter_xlsx,
+    "csv": _iter_csv,
+    "parquet": _iter_parquet,
+}
+
+
+def text_column(columns):
+    """The description column of a dataset, accepting ``DESC`` as an alias."""
+    for name in (TEXT_COLUMN,) + TEXT_COLUMN_ALIASES:
+        if name in columns:
+            return name
+    raise ValueError(f"Invalid file format. '{TEXT_COLUMN}' column is required")
+
+
+def iter_dataset(path, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Yields DataFrames of at most ``chunk_size`` rows read incrementally from ``path``.
+
+    The description column is always named ``Description`` and holds strings,
+    so batches can go straight into the vectorizer.
+    """
+    for frame in FRAME_READERS[dataset_format(path)](path, chunk_size):
+        column = text_column(frame.columns)
+        if column != TEXT_COLUMN:
+            frame = frame.rename(columns={column: TEXT_COLUMN})
+        frame[TEXT_COLUMN] = frame[TEXT_COLUMN].fillna("").astype(str)
+        yield frame
+
+
+def load_dataset(path, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Reads a whole dataset through ``iter_dataset``, for training which needs every row at once."""
+    import pandas as pd
+
+    return pd.concat(list(iter_dataset(path, chunk_size)), ignore_index=True)
@@ -0,0 +1,143 @@
+import os
+import time
+
+import joblib
+import numpy as np
+import scipy.sparse as sp
+from sklearn.cluster import MiniBatchKMeans
+from sklearn.feature_extraction.text import HashingVectorizer
+from sklearn.preprocessing import normalize
+
+from ml.artifacts import save_bundle
+from ml.inference import chunked
+from ml.registry import MODEL_FOLDER
+from ml.training import NGRAM_RANGE, dump_atomic
+
+MODEL_NAME = "minibatch"
+CHECKPOINT_FILE = "incremental_checkpoint.pkl"
+N_FEATURES = 2 ** 16
+BATCH_SIZE = 1000
+
+
+class IncrementalTfidf:
+    """TF-IDF over a stateless hashing vectorizer, with IDF updated batch by batch.
+
+    The vocabulary never has to be refitted: new batches only add to the
+    document frequency counts the IDF weights are derived from.
+    """
+
+    def __init__(self, n_features=N_FEATURES, ngram_range=NGRAM_RANGE):
+        self.n_features = n_features
+        self.ngram_range = tuple(ngram_range)
+        self.document_counts = np.zeros(n_features, dtype=np.int64)
+        self.n_documents = 0
+
+    @property
+    def hasher(self):
+        return HashingVectorizer(
+            n_features=self.n_features, ngram_range=self.ngram_range, alternate_sign=False, norm=None
+        )
+
+    def partial_fit(self, descriptions):
+        counts = self.hasher.transform(descriptions).tocsc()
+        self.document_counts += np.diff(counts.indptr)
+        self.n_documents += counts.shape[0]
+        return self
+
+    @property
+    def idf_(self):
+        # Same smoothing as sklearn's TfidfTransformer(smooth_idf=True)
+        return np.log((1 + self.n_documents) / (1 + self.document_counts)) + 1
+
+    def transform(self, descriptions):
+        counts = self.hasher.transform(descriptions)
+        return normalize(counts @ sp.diags(self.idf_), norm="l2", copy=False).tocsr()
+
+
+class IncrementalClusterer:
+    """A hashing TF-IDF + MiniBatchKMeans model that learns from new rows only."""
+
+    def __init__(self, n_clusters=5, n_features=N_FEATURES):
+        self.vectorizer = IncrementalTfidf(n_features=n_features)
+        self.model = MiniBatchKMeans(n_clusters=n_clusters, random_state=42, n_init=3)
+        self.last_issue_id = 0
+        self.n_seen = 0
+        self.updated_at = None
+
+    @property
+    def is_fitted(self):
+        return hasattr(self.model, "cluster_centers_")
+
+    def partial_fit(self, descriptions):
+        """Updates IDF statistics and centroids with one batch of descriptions."""
+        descriptions = list(descriptions)
+        if not self.is_fitted and len(descriptions) < self.model.n_clusters:
+            return False  # MiniBatchKMeans needs at least n_clusters rows to initialise
+        self.vectorizer.partial_fit(descriptions)
+        self.model.partial_fit(self.vectorizer.transform(descriptions))
+        self.n_seen += len(descriptions)
+        self.updated_at = time.time()
+        return True
+
+
+def checkpoint_path(folder=MODEL_FOLDER):
+    return os.path.join(folder, CHECKPOINT_FILE)
+
+
+def load_checkpoint(folder=MODEL_FOLDER, n_clusters=5):
+    """Returns the saved IncrementalClusterer, or a fresh one when there is none."""
+    path = checkpoint_path(folder)
+    if os.path.exists(path):
+        return joblib.load(path)
+    return IncrementalClusterer(n_clusters=n_clusters)
+
+
+def save_checkpoint(clusterer, folder=MODEL_FOLDER):
+    """Persists the checkpoint and publishes the model/vectorizer pair for the registry."""
+    os.makedirs(folder, exist_ok=True)
+    dump_atomic(clusterer, checkpoint_path(folder))
+    if clusterer.is_fitted:
+        dump_atomic(clusterer.vectorizer, os.path.join(folder, f"{MODEL_NAME}_vectorizer.pkl"))
+        dump_atomic(clusterer.model, os.path.join(folder, f"{MODEL_NAME}_model.pkl"))
+        save_bundle(MODEL_NAME, clusterer.model, clusterer.vectorizer, folder)
+
+
+def update_from_issues(n_clusters=5, batch_size=BATCH_SIZE, folder=MODEL_FOLDER):
+    """Feeds issues reported since the last checkpoint to the incremental model.
+
+    Must run inside an app context. Cost is proportional to the number of new
+    issues, not to the size of the issue table.
+    """
+    from models.issue import Issue
+
+    started = time.perf_counter()
+    clusterer = load_checkpoint(folder, n_clusters)
+    first_id = clusterer.last_issue_id
+    pending_ids, pending = [], []
+    learned = 0
+
+    rows = (
+        Issue.query.with_entities(Issue.id, Issue.description)
+        .filter(Issue.id > clusterer.last_issue_id)
+        .order_by(Issue.id)
+        .yield_per(batch_size)
+    )
+    for batch in chunked(rows, batch_size):
+        pending_ids.extend(row.id for row in batch)
+        pending.extend(row.description for row in batch)
+        if clusterer.partial_fit(pending):
+            learned += len(pending)
+            clusterer.last_issue_id = pending_ids[-1]
+            pending_ids, pending = [], []
+
+    if learned:
+        save_checkpoint(clusterer, folder)
+
+    return {
+        "model": MODEL_NAME,
+        "new_issues": learned,
+        "from_issue_id": first_id,
+        "last_issue_id": clusterer.last_issue_id,
+        "total_seen": clusterer.n_seen,
+        "duration_seconds": round(time.perf_counter() - started, 3),
+    }
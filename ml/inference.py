@@ -0,0 +1,253 @@
+from itertools import islice
+
+import numpy as np
+import scipy.sparse as sp
+
+from ml.registry import registry
+
+UNRECOGNIZED_DEPARTMENT = "Unrecognized department"
+DEFAULT_CHUNK_SIZE = 1000
+DEFAULT_MEMORY_BUDGET_MB = 64  # Distance block size for DBSCAN predictions against every core sample
+
+DEPARTMENT_MAPPING = {
+    0: "Police Department",
+    1: "Health Department",
+    2: "Education Department",
+    3: "Public Works Department",
+    4: "Municipal Committee"
+}
+
+
+def chunked(iterable, chunk_size):
+    """Yields lists of at most ``chunk_size`` items from ``iterable``."""
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def chunked_ranges(n_rows, chunk_size):
+    """Yields (start, stop) row ranges covering ``n_rows`` in steps of ``chunk_size``."""
+    for start in range(0, n_rows, chunk_size):
+        yield start, min(start + chunk_size, n_rows)
+
+
+def rows_per_block(n_columns, memory_budget_mb):
+    """Rows of an ``n_columns``-wide float64 block that fit in ``memory_budget_mb``."""
+    return max(1, int(memory_budget_mb * 2 ** 20 // (8 * max(n_columns, 1))))
+
+
+def row_norms_squared(X):
+    """Squared L2 norm of every row, computed on the non-zeros for sparse input."""
+    if sp.issparse(X):
+        return np.asarray(X.multiply(X).sum(axis=1)).ravel()
+    return np.einsum("ij,ij->i", X, X)
+
+
+def nearest_centroid(X, centers, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Index of the closest row of ``centers`` for every row of ``X``.
+
+    Uses ||x - c||^2 = ||x||^2 - 2 x.c + ||c||^2 so a CSR ``X`` is only ever
+    multiplied against the small dense centre matrix, never densified.
+    """
+    centers = np.asarray(centers, dtype=np.float64)
+    c_sq = np.einsum("ij,ij->i", centers, centers)
+    labels = np.empty(X.shape[0], dtype=np.int64)
+    for start, stop in chunked_ranges(X.shape[0], chunk_size):
+        # ||x||^2 is constant per row, so it does not change the argmin
+        distances = c_sq[None, :] - 2 * np.asarray(X[start:stop] @ centers.T)
+        labels[start:stop] = np.argmin(distances, axis=1)
+    return labels
+
+
+def nearest_centroid_margin(X, centers, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Closest centre and a confidence in [0, 1] for every row of ``X``.
+
+    The confidence is the relative margin ``1 - d1 / d2`` between the nearest
+    and second-nearest centre: 0 when a row sits halfway between two
+    clusters, approaching 1 when it is much closer to one of them.
+    """
+    centers = np.asarray(centers, dtype=np.float64)
+    c_sq = np.einsum("ij,ij->i", centers, centers)
+    labels = np.empty(X.shape[0], dtype=np.int64)
+    margins = np.zeros(X.shape[0])
+    if centers.shape[0] < 2:
+        labels[:] = 0
+        return labels, margins
+
+    x_sq = row_norms_squared(X)
+    for start, stop in chunked_ranges(X.shape[0], chunk_size):
+        squared = x_sq[start:stop, None] + c_sq[None, :] - 2 * np.asarray(X[start:stop] @ centers.T)
+        distances = np.sqrt(np.maximum(squared, 0))
+        nearest_two = np.partition(distances, 1, axis=1)  # Columns 0 and 1 hold the two smallest, in order
+        ratio = np.divide(nearest_two[:, 0], nearest_two[:, 1], out=np.ones(stop - start), where=nearest_two[:, 1] > 0)
+        labels[start:stop] = np.argmin(distances, axis=1)
+        margins[start:stop] = 1 - ratio
+    return labels, margins
+
+
+class CentroidTable:
+    """A centroid matrix and the cluster and department each of its rows stands for.
+
+    Nearest-centroid lookup is one sparse matmul and an argmax: with the
+    half squared norms precomputed, argmax(X @ C.T - |c|^2 / 2) is the
+    closest centre. ``departments[i]`` is the label of row ``i`` and
+    ``votes[i]`` how many labelled training rows it was learned from; with
+    no votes the department is only the ``DEPARTMENT_MAPPING`` default.
+    """
+
+    def __init__(self, clusters, centroids, departments, votes=None):
+        self.clusters = np.asarray(clusters, dtype=np.int64)
+        self.centroids = np.asarray(centroids, dtype=np.float64)
+        self.departments = np.asarray(departments, dtype=object)
+        self.votes = np.zeros(len(self.clusters), dtype=np.int64) if votes is None else np.asarray(votes, dtype=np.int64)
+        self.half_sq = 0.5 * np.einsum("ij,ij->i", self.centroids, self.centroids)
+
+    @property
+    def learned(self):
+        """Whether each row's department came from labelled data rather than the default mapping."""
+        return self.votes > 0
+
+    @classmethod
+    def from_centers(cls, centers):
+        """A table for an estimator's own centres, labelled with the default ``DEPARTMENT_MAPPING``."""
+        clusters = np.arange(len(centers))
+        return cls(clusters, centers, [DEPARTMENT_MAPPING.get(int(cluster), UNRECOGNIZED_DEPARTMENT) for cluster in clusters])
+
+    def label_map(self):
+        return {int(cluster): department for cluster, department in zip(self.clusters, self.departments)}
+
+    def nearest(self, X, chunk_size=DEFAULT_CHUNK_SIZE):
+        """Row index into the table of the closest centre, for every row of ``X``."""
+        rows = np.empty(X.shape[0], dtype=np.int64)
+        for start, stop in chunked_ranges(X.shape[0], chunk_size):
+            rows[start:stop] = np.argmax(np.asarray(X[start:stop] @ self.centroids.T) - self.half_sq, axis=1)
+        return rows
+
+
+def nearest_core_sample(model, X, memory_budget_mb=DEFAULT_MEMORY_BUDGET_MB):
+    """Inductive DBSCAN: the cluster of the closest core sample within ``eps``, else -1 (noise).
+
+    A new point is exactly what DBSCAN would have called a border point of
+    that cluster had it been in the training data. Rows are processed in
+    blocks whose distance matrix to all core samples fits ``memory_budget_mb``.
+    """
+    if model.metric != "euclidean":
+        raise ValueError(f"Cannot predict DBSCAN clusters for metric '{model.metric}'")
+    labels = np.full(X.shape[0], -1, dtype=np.int64)
+    core = model.components_
+    if core.shape[0] == 0:
+        return labels
+
+    core_labels = np.asarray(model.labels_)[model.core_sample_indices_]
+    core_sq = row_norms_squared(core)
+    x_sq = row_norms_squared(X)
+    # ✅ Sparse core samples times a densified chunk gives the distance block directly, with no
+    # sparse product in between. The budget covers the chunk, the block and argmin's contiguous copy of it
+    block_rows = rows_per_block(2 * core.shape[0] + X.shape[1], memory_budget_mb)
+    for start, stop in chunked_ranges(X.shape[0], block_rows):
+        chunk_t = X[start:stop].T.toarray() if sp.issparse(X) else np.ascontiguousarray(X[start:stop].T)
+        squared = np.asarray(core @ chunk_t).T
+        del chunk_t
+        squared *= -2
+        squared += core_sq[None, :]
+        squared += x_sq[start:stop, None]
+        nearest = np.argmin(squared, axis=1)
+        within = squared[np.arange(stop - start), nearest] <= model.eps ** 2
+        labels[start:stop] = np.where(within, core_labels[nearest], -1)
+    return labels
+
+
+def centroid_table(bundle):
+    """The bundle's learned table, or one built from the model's centres; None if it has neither."""
+    if getattr(bundle, "table", None) is not None:
+        return bundle.table if len(bundle.table.clusters) else None  # e.g. DBSCAN that found only noise
+    if hasattr(bundle.model, "cluster_centers_"):
+        return CentroidTable.from_centers(bundle.model.cluster_centers_)
+    return None
+
+
+def predict_clusters(model, X, table=None):
+    """Predicts cluster labels for ``X`` while keeping it sparse where possible.
+
+    DBSCAN and agglomerative clustering have no ``predict``: DBSCAN uses the
+    nearest core sample and agglomerative the training centroids in ``table``.
+    """
+    if hasattr(model, "core_sample_indices_"):
+        return nearest_core_sample(model, X)
+    if hasattr(model, "cluster_centers_"):
+        return nearest_centroid(X, model.cluster_centers_)
+    if table is not None:
+        return table.clusters[table.nearest(X)]
+    if not hasattr(model, "predict"):
+        raise ValueError(f"{type(model).__name__} cannot label new data without a centroid table. Please retrain it.")
+    return model.predict(X)
+
+
+def predict_departments(bundle, X):
+    """Departments for the vectorized rows ``X`` using the bundle's learned label map."""
+    table = centroid_table(bundle)
+    if hasattr(bundle.model, "core_sample_indices_"):
+        label_map = table.label_map() if table is not None else DEPARTMENT_MAPPING
+        return [label_map.get(int(cluster), UNRECOGNIZED_DEPARTMENT) for cluster in nearest_core_sample(bundle.model, X)]
+    if table is None:
+        return [UNRECOGNIZED_DEPARTMENT] * X.shape[0]
+    return table.departments[table.nearest(X)].tolist()
+
+
+def iter_classify(descriptions, model_name=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Yields the departments for ``descriptions``, one list per chunk.
+
+    Each chunk is vectorized with a single ``transform`` call and predicted on
+    the sparse matrix in one shot. The bundle is resolved once up front so a
+    model swap halfway through a backlog cannot mix two models in one run.
+    """
+    bundle = registry.get(model_name)
+
+    for chunk in chunked(descriptions, chunk_size):
+        if bundle is None or bundle.vectorizer is None:
+            yield [UNRECOGNIZED_DEPARTMENT] * len(chunk)
+            continue
+
+        yield predict_departments(bundle, bundle.vectorizer.transform(chunk))
+
+
+def classify_with_confidence(descriptions, model_name=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Returns ``(department, confidence)`` per description.
+
+    Confidence is the centroid margin (see ``nearest_centroid_margin``).
+    It measures how well separated the clusters are, not whether the label
+    is right, so clusters whose department was not learned from labelled
+    rows get 0. So do descriptions the label map does not recognise and
+    DBSCAN predictions whose core-sample cluster disagrees with the nearest
+    centroid, so a caller can always hand them to a better classifier.
+    """
+    bundle = registry.get(model_name)
+    table = centroid_table(bundle) if bundle is not None else None
+    results = []
+    for chunk in chunked(descriptions, chunk_size):
+        if table is None or bundle.vectorizer is None:
+            results.extend((UNRECOGNIZED_DEPARTMENT, 0.0) for _ in chunk)
+            continue
+
+        X = bundle.vectorizer.transform(chunk)
+        rows, confidences = nearest_centroid_margin(X, table.centroids)
+        departments = table.departments[rows]
+        confidences = np.where(table.learned[rows], confidences, 0.0)
+        if hasattr(bundle.model, "core_sample_indices_"):
+            clusters = nearest_core_sample(bundle.model, X)
+            confidences = np.where(clusters == table.clusters[rows], confidences, 0.0)
+
+        for department, confidence in zip(departments, confidences):
+            results.append((department, float(confidence) if department != UNRECOGNIZED_DEPARTMENT else 0.0))
+    return results
+
+
+def classify_batch(descriptions, model_name=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Returns one department per description, in input order."""
+    departments = []
+    for chunk in iter_classify(descriptions, model_name, chunk_size):
+        departments.extend(chunk)
+    return departments
@@ -0,0 +1,174 @@
+import json
+import multiprocessing
+import os
+import re
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+
+JOBS_FOLDER = os.path.join("instance", "training_jobs")
+STATUS_FILE = "status.json"
+PARAMS_FILE = "params.json"
+FINISHED_STATES = ("succeeded", "failed")
+
+_JOB_ID = re.compile(r"^[0-9a-f]{32}$")
+
+
+def _write_json(path, data):
+    """Writes JSON atomically so pollers never read a half-written file."""
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
+
+
+def _read_json(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def update_status(job_dir, **changes):
+    """Merges ``changes`` into the job's status file."""
+    status_path = os.path.join(job_dir, STATUS_FILE)
+    status = _read_json(status_path)
+    status.update(changes, updated_at=time.time())
+    _write_json(status_path, status)
+    return status
+
+
+def run_training_job(job_dir):
+    """Executes one training job; runs inside a worker process of the pool.
+
+    The training engine is imported here, so each pool process pays the
+    sklearn/pandas import once and keeps it warm for later jobs.
+    """
+    from ml.training import run_training
+
+    started = time.time()
+    update_status(job_dir, status="running", stage="starting", progress=0.05, started_at=started)
+
+    stage, stage_started, stage_seconds = "starting", started, {}
+
+    def end_stage():
+        stage_seconds[stage] = round(time.time() - stage_started, 3)
+
+    def progress(next_stage, fraction):
+        nonlocal stage, stage_started
+        end_stage()
+        stage, stage_started = next_stage, time.time()
+        update_status(job_dir, stage=stage, progress=fraction, stage_seconds=stage_seconds)
+
+    try:
+        metrics = run_training(_read_json(os.path.join(job_dir, PARAMS_FILE)), progress=progress)
+    except Exception as e:
+        end_stage()
+        update_status(
+            job_dir, status="failed", stage="failed", error=str(e), finished_at=time.time(), stage_seconds=stage_seconds,
+        )
+        return False
+
+    end_stage()
+    update_status(
+        job_dir, status="succeeded", stage="done", progress=1.0, metrics=metrics, stage_seconds=stage_seconds,
+        finished_at=time.time(), duration_seconds=round(time.time() - started, 3),
+    )
+    return True
+
+
+class TrainingJobQueue:
+    """Runs training jobs in a bounded process pool.
+
+    Each job gets its own folder holding its dataset, parameters and status, so
+    concurrent jobs never share files and any web worker can answer status polls.
+    """
+
+    def __init__(self, folder=JOBS_FOLDER, max_workers=2, on_finished=None):
+        self.folder = folder
+        self.max_workers = max_workers
+        self.on_finished = on_finished
+        self._executor = None
+
+    @property
+    def executor(self):
+        if self._executor is None:
+            methods = multiprocessing.get_all_start_methods()
+            # fork avoids re-importing the Flask app in every worker; Windows only has spawn
+            context = multiprocessing.get_context("fork" if "fork" in methods else None)
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers, mp_context=context)
+        return self._executor
+
+    def job_dir(self, job_id):
+        if not _JOB_ID.match(job_id or ""):
+            return None
+        return os.path.join(self.folder, job_id)
+
+    def create(self, model_name, hyperparameters, filename, options=None):
+        """Registers a queued job and returns (job_id, path the dataset should be saved to).
+
+        ``options`` (e.g. a sweep's ranking metric) are stored with the parameters.
+        """
+        job_id = uuid.uuid4().hex
+        job_dir = os.path.join(self.folder, job_id)
+        os.makedirs(job_dir)
+
+        dataset_path = os.path.join(job_dir, filename)
+        _write_json(os.path.join(job_dir, PARAMS_FILE), {
+            "dataset_path": dataset_path,
+            "model": model_name,
+            "hyperparameters": hyperparameters,
+            **(options or {}),
+        })
+        _write_json(os.path.join(job_dir, STATUS_FILE), {
+            "job_id": job_id,
+            "model": model_name,
+            "status": "queued",
+            "stage": "queued",
+            "progress": 0.0,
+            "metrics": {},
+            "stage_seconds": {},
+            "error": None,
+            "created_at": time.time(),
+            "updated_at": time.time(),
+        })
+        return job_id, dataset_path
+
+    def start(self, job_id):
+        """Hands a created job to the process pool."""
+        job_dir = self.job_dir(job_id)
+        future = self.executor.submit(run_training_job, job_dir)
+        future.add_done_callback(lambda f: self._finished(job_dir, f))
+
+    def status(self, job_id):
+        """Returns the job's status dict, or None for an unknown job."""
+        job_dir = self.job_dir(job_id)
+        if job_dir is None or not os.path.exists(os.path.join(job_dir, STATUS_FILE)):
+            return None
+        return _read_json(os.path.join(job_dir, STATUS_FILE))
+
+    def watch(self, job_id, poll_interval=0.5, heartbeat_seconds=15):
+        """Yields the job's status each time it changes, until it succeeds or fails.
+
+        Yields None after ``heartbeat_seconds`` without a change, so a streaming
+        caller can keep idle connections open.
+        """
+        last_update, last_yield = None, time.monotonic()
+        while True:
+            status = self.status(job_id)
+            if status is None:
+                return
+            if status["updated_at"] != last_update:
+                last_update, last_yield = status["updated_at"], time.monotonic()
+                yield status
+                if status["status"] in FINISHED_STATES:
+                    return
+            elif time.monotonic() - last_yield >= heartbeat_seconds:
+                last_yield = time.monotonic()
+                yield None
+            time.sleep(poll_interval)
+
+    def _finished(self, job_dir, future):
+        error = future.exception()
+        if error is not None:
+            update_status(job_dir, status="failed", stage="failed", error=str(error), finished_at=time.time())
+        if self.on_finished is not None:
+            self.on_finished(os.path.basename(job_dir))
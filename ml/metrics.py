@@ -0,0 +1,157 @@
+import numpy as np
+import scipy.sparse as sp
+
+from ml.inference import row_norms_squared, chunked_ranges, rows_per_block
+
+DEFAULT_CHUNK_SIZE = 2048
+DEFAULT_MEMORY_BUDGET_MB = 256
+DEFAULT_SILHOUETTE_SAMPLE_SIZE = 10000
+DEFAULT_DUNN_EXACT_MAX_ROWS = 50000
+
+
+def cluster_centroids(X, labels):
+    """Returns (cluster ids, dense centroids, per-row cluster index) without densifying ``X``."""
+    clusters, codes = np.unique(labels, return_inverse=True)
+    indicator = sp.csr_matrix(
+        (np.ones(len(codes)), (codes, np.arange(len(codes)))), shape=(len(clusters), X.shape[0])
+    )
+    counts = np.bincount(codes, minlength=len(clusters)).astype(np.float64)
+    sums = indicator @ X
+    centroids = (sums.toarray() if sp.issparse(sums) else np.asarray(sums)) / counts[:, None]
+    return clusters, centroids, codes
+
+
+def davies_bouldin(X, labels, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Davies-Bouldin index on sparse or dense ``X``, matching sklearn's definition."""
+    clusters, centroids, codes = cluster_centroids(X, labels)
+
+    x_sq = row_norms_squared(X)
+    c_sq = np.einsum("ij,ij->i", centroids, centroids)
+    intra_sums = np.zeros(len(clusters))
+    for start, stop in chunked_ranges(X.shape[0], chunk_size):
+        rows = X[start:stop]
+        own = codes[start:stop]
+        cross = np.asarray(rows @ centroids.T)[np.arange(stop - start), own]
+        sq = np.maximum(x_sq[start:stop] - 2 * cross + c_sq[own], 0)
+        intra_sums += np.bincount(own, weights=np.sqrt(sq), minlength=len(clusters))
+    intra_dists = intra_sums / np.bincount(codes, minlength=len(clusters))
+
+    diff = c_sq[:, None] - 2 * centroids @ centroids.T + c_sq[None, :]
+    centroid_distances = np.sqrt(np.maximum(diff, 0))
+    np.fill_diagonal(centroid_distances, 0)
+
+    if np.allclose(intra_dists, 0) or np.allclose(centroid_distances, 0):
+        return 0.0
+
+    centroid_distances[centroid_distances == 0] = np.inf
+    combined_intra_dists = intra_dists[:, None] + intra_dists
+    scores = np.max(combined_intra_dists / centroid_distances, axis=1)
+    return float(np.mean(scores))
+
+
+def dunn_index(X, labels, memory_budget_mb=DEFAULT_MEMORY_BUDGET_MB, method="auto", exact_max_rows=DEFAULT_DUNN_EXACT_MAX_ROWS):
+    """Dunn index: smallest inter-cluster distance over largest cluster diameter.
+
+    ``method="exact"`` walks the pairwise distances in row blocks sized to
+    ``memory_budget_mb``, so memory stays bounded although time is O(n^2).
+    ``method="centroid"`` uses centroid separation over twice the largest
+    point-to-centroid radius, which is O(n * k). ``"auto"`` picks exact up to
+    ``exact_max_rows`` rows.
+    """
+    if method == "auto":
+        method = "exact" if X.shape[0] <= exact_max_rows else "centroid"
+    if method == "centroid":
+        return _dunn_centroid(X, labels, memory_budget_mb)
+    if method != "exact":
+        raise ValueError(f"Unknown Dunn index method: {method}")
+
+    from sklearn.metrics import pairwise_distances_chunked
+
+    clusters, codes = np.unique(labels, return_inverse=True)
+    min_inter = np.inf
+    diameters = np.zeros(len(clusters))
+
+    def reduce_block(D_chunk, start):
+        own = codes[start:start + D_chunk.shape[0]]
+        # Masked reductions: the only temporary is one boolean mask, an eighth of the float block
+        same = own[:, None] == codes[None, :]
+        intra = np.max(D_chunk, axis=1, where=same, initial=0.0)
+        inter = np.min(D_chunk, axis=1, where=np.logical_not(same, out=same), initial=np.inf)
+        return inter, own, intra
+
+    for inter, own, intra in pairwise_distances_chunked(
+        X, metric="euclidean", reduce_func=reduce_block, working_memory=memory_budget_mb * 8 / 9
+    ):
+        min_inter = min(min_inter, inter.min())
+        np.maximum.at(diameters, own, intra)
+
+    max_intra = diameters.max()
+    if max_intra <= 0 or not np.isfinite(min_inter):
+        return 0.0
+    return float(min_inter / max_intra)
+
+
+def _dunn_centroid(X, labels, memory_budget_mb):
+    """Centroid shortcut for the Dunn index, linear in the number of rows."""
+    clusters, centroids, codes = cluster_centroids(X, labels)
+    if len(clusters) < 2:
+        return 0.0
+
+    radii = np.zeros(len(clusters))
+    np.maximum.at(radii, codes, _distances_to_own_centroid(X, centroids, codes, memory_budget_mb))
+    max_diameter = 2 * radii.max()
+
+    c_sq = np.einsum("ij,ij->i", centroids, centroids)
+    separation = np.sqrt(np.maximum(c_sq[:, None] - 2 * centroids @ centroids.T + c_sq[None, :], 0))
+    np.fill_diagonal(separation, np.inf)
+
+    if max_diameter <= 0:
+        return 0.0
+    return float(separation.min() / max_diameter)
+
+
+def _distances_to_own_centroid(X, centroids, codes, memory_budget_mb):
+    """Euclidean distance from every row of ``X`` to the centroid of its cluster."""
+    x_sq = row_norms_squared(X)
+    c_sq = np.einsum("ij,ij->i", centroids, centroids)
+    distances = np.empty(X.shape[0])
+    for start, stop in chunked_ranges(X.shape[0], rows_per_block(len(centroids), memory_budget_mb)):
+        own = codes[start:stop]
+        cross = np.asarray(X[start:stop] @ centroids.T)[np.arange(stop - start), own]
+        distances[start:stop] = np.sqrt(np.maximum(x_sq[start:stop] - 2 * cross + c_sq[own], 0))
+    return distances
+
+
+def silhouette(X, labels, sample_size=DEFAULT_SILHOUETTE_SAMPLE_SIZE, memory_budget_mb=DEFAULT_MEMORY_BUDGET_MB, random_state=42):
+    """Silhouette score, computed on a random sample once ``X`` has more rows than ``sample_size``."""
+    from sklearn import config_context
+    from sklearn.metrics import silhouette_score
+
+    if sample_size is not None and X.shape[0] <= sample_size:
+        sample_size = None
+
+    with config_context(working_memory=memory_budget_mb):
+        return float(silhouette_score(X, labels, sample_size=sample_size, random_state=random_state))
+
+
+def iter_cluster_metrics(X, labels, memory_budget_mb=DEFAULT_MEMORY_BUDGET_MB, silhouette_sample_size=DEFAULT_SILHOUETTE_SAMPLE_SIZE, dunn_method="auto", dunn_exact_max_rows=DEFAULT_DUNN_EXACT_MAX_ROWS):
+    """Yields ``(name, value)`` for each metric as soon as it is computed.
+
+    Yields nothing when there are fewer than two clusters.
+    """
+    labels = np.asarray(labels)
+    n_clusters = len(np.unique(labels))
+    if n_clusters < 2:
+        return
+
+    yield "silhouette_score", silhouette(X, labels, silhouette_sample_size, memory_budget_mb)
+    yield "davies_bouldin", davies_bouldin(X, labels, rows_per_block(n_clusters, memory_budget_mb))
+    yield "dunn_index", dunn_index(X, labels, memory_budget_mb, dunn_method, dunn_exact_max_rows)
+
+
+def cluster_metrics(X, labels, memory_budget_mb=DEFAULT_MEMORY_BUDGET_MB, silhouette_sample_size=DEFAULT_SILHOUETTE_SAMPLE_SIZE, dunn_method="auto", dunn_exact_max_rows=DEFAULT_DUNN_EXACT_MAX_ROWS):
+    """Silhouette, Davies-Bouldin and Dunn for a labelling, within ``memory_budget_mb``.
+
+    Returns an empty dict when there are fewer than two clusters.
+    """
+    return dict(iter_cluster_metrics(X, labels, memory_budget_mb, silhouette_sample_size, dunn_method, dunn_exact_max_rows))
@@ -0,0 +1,176 @@
+import hashlib
+import io
+import os
+import threading
+import time
+
+
+MODEL_FOLDER = "mlmodels"
+VECTORIZER_FILE = "tfidf_vectorizer.pkl"
+DEFAULT_MODEL = "kmeans"
+
+
+class _Artifact:
+    """A loaded pickle plus the file state it was loaded from."""
+
+    def __init__(self, obj, stamp, digest):
+        self.obj = obj
+        self.stamp = stamp
+        self.digest = digest
+
+
+class ModelBundle:
+    """A clusterer, the vectorizer it was trained with and its centroid table, swapped as one unit."""
+
+    def __init__(self, name, model, vectorizer, version, table=None):
+        self.name = name
+        self.model = model
+        self.vectorizer = vectorizer
+        self.version = version
+        self.table = table
+
+
+class ModelRegistry:
+    """Keeps trained models and the TF-IDF vectorizer loaded in memory.
+
+    Files are unpickled once and re-validated against their mtime/size at most
+    every ``check_interval`` seconds, so warm lookups do no disk I/O. When a file
+    changes, its content hash decides whether it actually needs re-loading.
+    A model's artifact bundle (see ml.artifacts) is preferred over its pickles.
+    """
+
+    def __init__(self, folder=MODEL_FOLDER, check_interval=5.0):
+        self.folder = folder
+        self.check_interval = check_interval
+        self.active_model = None
+        self.on_load = None  # Called with (artifact format, seconds) after each load from disk
+        self._lock = threading.Lock()
+        self._artifacts = {}
+        self._bundles = {}
+        self._checked_at = {}
+
+    def model_path(self, model_name):
+        return os.path.join(self.folder, f"{model_name.lower()}_model.pkl")
+
+    def vectorizer_path(self, model_name=None):
+        """A model-specific ``<name>_vectorizer.pkl`` wins over the shared TF-IDF vectorizer."""
+        if model_name:
+            own_path = os.path.join(self.folder, f"{model_name.lower()}_vectorizer.pkl")
+            if os.path.exists(own_path):
+                return own_path
+        return os.path.join(self.folder, VECTORIZER_FILE)
+
+    def get(self, model_name=None):
+        """Returns the ModelBundle for ``model_name`` (or the active model), or None."""
+        name = (model_name or self.active_model or DEFAULT_MODEL).lower()
+        bundle = self._bundles.get(name)
+        if bundle is not None and time.monotonic() - self._checked_at.get(name, 0) < self.check_interval:
+            return bundle
+
+        with self._lock:
+            loaded = self._load_bundle(name) or self._load_pickles(name)
+            if loaded is None:
+                self._bundles.pop(name, None)
+                return None
+            model, vectorizer, table, version = loaded
+            bundle = self._bundles.get(name)
+            if bundle is None or bundle.version != version:
+                bundle = ModelBundle(name, model, vectorizer, version, table)
+                self._bundles[name] = bundle
+            self._checked_at[name] = time.monotonic()
+            return bundle
+
+    def activate(self, model_name):
+        """Makes ``model_name`` the model used when no explicit name is given."""
+        self.active_model = model_name.lower()
+        self.invalidate(self.active_model)
+
+    def invalidate(self, model_name=None):
+        """Forces the next lookup to re-check files on disk."""
+        with self._lock:
+            if model_name is None:
+                self._checked_at.clear()
+            else:
+                self._checked_at.pop(model_name.lower(), None)
+
+    def _load_pickles(self, name):
+        """``(model, vectorizer, None, version)`` from the ``.pkl`` files, or None. Caller holds the lock.
+
+        Pickles carry no centroid table; inference falls back to the model's own centres.
+        """
+        model = self._load(self.model_path(name))
+        if model is None:
+            return None
+        vectorizer = self._load(self.vectorizer_path(name))
+        version = (model.digest, vectorizer.digest if vectorizer is not None else None)
+        return model.obj, vectorizer.obj if vectorizer is not None else None, None, version
+
+    def _load_bundle(self, name):
+        """``(model, vectorizer, table, version)`` from the artifact bundle, or None. Caller holds the lock."""
+        from ml.artifacts import MANIFEST_FILE, bundle_dir, load_bundle, load_centroid_table
+
+        directory = bundle_dir(self.folder, name)
+        manifest_path = os.path.join(directory, MANIFEST_FILE)
+        try:
+            stat = os.stat(manifest_path)
+        except FileNotFoundError:
+            self._artifacts.pop(manifest_path, None)
+            return None
+
+        stamp = (stat.st_mtime_ns, stat.st_size)
+        artifact = self._artifacts.get(manifest_path)
+        if artifact is None or artifact.stamp != stamp:
+            with open(manifest_path, "rb") as f:
+                digest = hashlib.sha256(f.read()).hexdigest()
+            if artifact is not None and artifact.digest == digest:
+                artifact = _Artifact(artifact.obj, stamp, digest)
+            else:
+                started = time.perf_counter()
+                try:
+                    model, vectorizer, manifest = load_bundle(directory)
+                    table = load_centroid_table(directory, manifest)
+                except (OSError, ValueError, KeyError, TypeError) as e:
+                    print(f"❌ Error loading artifact bundle {directory}, using the pickles: {e}")
+                    return None
+                self._loaded("bundle", started)
+                artifact = _Artifact((model, vectorizer, table), stamp, digest)
+            self._artifacts[manifest_path] = artifact
+
+        model, vectorizer, table = artifact.obj
+        return model, vectorizer, table, ("bundle", artifact.digest)
+
+    def _loaded(self, artifact_format, started):
+        if self.on_load is not None:
+            self.on_load(artifact_format, time.perf_counter() - started)
+
+    def _load(self, path):
+        """Loads ``path`` unless the cached copy still matches it. Caller holds the lock."""
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            self._artifacts.pop(path, None)
+            return None
+
+        stamp = (stat.st_mtime_ns, stat.st_size)
+        artifact = self._artifacts.get(path)
+        if artifact is not None and artifact.stamp == stamp:
+            return artifact
+
+        with open(path, "rb") as f:
+            data = f.read()
+        digest = hashlib.sha256(data).hexdigest()
+        if artifact is not None and artifact.digest == digest:
+            obj = artifact.obj
+        else:
+            import joblib
+
+            started = time.perf_counter()
+            obj = joblib.load(io.BytesIO(data))
+            self._loaded("pickle", started)
+
+        artifact = _Artifact(obj, stamp, digest)
+        self._artifacts[path] = artifact
+        return artifact
+
+
+registry = ModelRegistry()
@@ -0,0 +1,175 @@
+"""Hyperparameter sweeps: many candidates of one model on a single feature matrix.
+
+The dataset is vectorized once (and cached on disk by content hash, so a
+repeated sweep over the same file skips TF-IDF entirely), then every
+candidate is fitted and scored in parallel with joblib. Large arrays are
+memory-mapped into the worker processes instead of copied per candidate.
+
+Only the grid helpers are needed by the web process, so the ML stack is
+imported inside the functions that run in the training job.
+"""
+import hashlib
+import itertools
+import math
+import os
+import time
+
+FEATURE_CACHE_FOLDER = os.path.join("instance", "feature_cache")
+FEATURE_CACHE_MAX_FILES = 8  # Oldest cached matrices are removed above this
+
+# Metric name -> True when higher is better
+SWEEP_METRICS = {
+    "adjusted_rand": True,
+    "silhouette_score": True,
+    "davies_bouldin": False,
+    "dunn_index": True,
+}
+
+
+def parameter_grid(hyperparameters):
+    """Expands comma-separated values (``n_clusters="3,4,5"``) into one dict per combination.
+
+    Keys left empty (``min_samples=""``) are dropped so the model's default
+    applies; without any key the grid is a single ``{}``.
+    """
+    values = {}
+    for key, value in hyperparameters.items():
+        parts = [part.strip() for part in str(value).split(",") if part.strip()]
+        if parts:
+            values[key] = parts
+    return [dict(zip(values, combination)) for combination in itertools.product(*values.values())]
+
+
+def _file_digest(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def cached_features(df, dataset_path, max_features=None, ngram_range=None, folder=FEATURE_CACHE_FOLDER):
+    """``(vectorizer, X, cache hit)`` for a dataset, reusing the CSR matrix of an earlier sweep on the same file."""
+    import joblib
+    from ml.training import MAX_FEATURES, NGRAM_RANGE, TEXT_COLUMN, dump_atomic, fit_vectorizer
+
+    max_features = max_features or MAX_FEATURES
+    ngram_range = ngram_range or NGRAM_RANGE
+    key = f"{_file_digest(dataset_path)}\0{max_features}\0{tuple(ngram_range)}"
+    path = os.path.join(folder, f"{hashlib.sha256(key.encode('utf-8')).hexdigest()[:32]}.pkl")
+    if os.path.exists(path):
+        try:
+            vectorizer, X = joblib.load(path)
+            os.utime(path)  # Recently used entries survive eviction
+            return vectorizer, X, True
+        except Exception as e:
+            print(f"❌ Error reading cached features {path}: {e}")
+
+    vectorizer, X = fit_vectorizer(df[TEXT_COLUMN], max_features, ngram_range)
+    os.makedirs(folder, exist_ok=True)
+    dump_atomic((vectorizer, X), path)
+
+    cached = sorted(
+        (os.path.join(folder, name) for name in os.listdir(folder) if name.endswith(".pkl")),
+        key=os.path.getmtime,
+    )
+    for stale in cached[:-FEATURE_CACHE_MAX_FILES]:
+        try:
+            os.remove(stale)
+        except OSError:
+            pass
+    return vectorizer, X, False
+
+
+def fit_candidate(model_name, hyperparameters, X, reduced=None, references=None):
+    """Fits and scores one candidate; runs in a joblib worker.
+
+    Returns ``(entry, model, labels)`` where ``entry`` is its leaderboard row.
+    A candidate that fails to fit is reported with its error, not raised.
+    """
+    import numpy as np
+    from sklearn.metrics import adjusted_rand_score
+    from ml.metrics import cluster_metrics
+    from ml.training import fit_model
+
+    started = time.perf_counter()
+    entry = {"hyperparameters": hyperparameters}
+    try:
+        model, labels = fit_model(model_name, X, hyperparameters, reduced)
+    except Exception as e:
+        entry.update(error=str(e), seconds=round(time.perf_counter() - started, 3))
+        return entry, None, None
+
+    metrics = cluster_metrics(X, labels, dunn_method="centroid")
+    if references is not None:
+        known = np.array([reference is not None for reference in references])
+        if known.any():
+            metrics["adjusted_rand"] = float(
+                adjusted_rand_score(np.asarray(references, dtype=object)[known].astype(str), labels[known])
+            )
+    entry.update(
+        metrics=metrics,
+        n_clusters=int(len(set(labels.tolist()) - {-1})),
+        n_noise=int(np.sum(labels == -1)),
+        seconds=round(time.perf_counter() - started, 3),
+    )
+    return entry, model, labels
+
+
+def rank_candidates(entries, metric):
+    """Sorts leaderboard rows best first; rows without ``metric`` (failed or a single cluster) go last."""
+    higher_is_better = SWEEP_METRICS[metric]
+
+    def key(entry):
+        value = entry.get("metrics", {}).get(metric)
+        if value is None or not math.isfinite(value):
+            return (1, 0.0)
+        return (0, -value if higher_is_better else value)
+
+    return sorted(entries, key=key)
+
+
+def run_sweep(df, model_name, grid, dataset_path, metric=None, n_jobs=-1, progress=None):
+    """Fits every hyperparameter dict in ``grid`` and returns the ``train``-style result of the best.
+
+    ``metric`` defaults to the adjusted Rand index against the dataset's
+    labels when it has them, otherwise the silhouette score. The result's
+    diagnostics carry the full ``leaderboard``.
+    """
+    import joblib
+    from ml.training import SVD_COMPONENTS, _noop_progress, reduce_dimensions, reference_departments, summarize
+
+    progress = progress or _noop_progress
+    references = reference_departments(df)
+    metric = metric or ("adjusted_rand" if references is not None else "silhouette_score")
+    if metric not in SWEEP_METRICS:
+        raise ValueError(f"Unknown sweep metric '{metric}'. Use one of: {', '.join(SWEEP_METRICS)}")
+
+    progress("vectorizing", 0.15)
+    vectorizer, X, cache_hit = cached_features(df, dataset_path)
+    reduced = reduce_dimensions(X, SVD_COMPONENTS) if model_name == "hierarchical" else None
+
+    progress("fitting", 0.2)
+    candidates = joblib.Parallel(n_jobs=n_jobs, return_as="generator")(
+        joblib.delayed(fit_candidate)(model_name, hyperparameters, X, reduced, references)
+        for hyperparameters in grid
+    )
+    fitted = []
+    for entry, model, labels in candidates:
+        fitted.append((entry, model, labels))
+        progress(f"fitting {len(fitted)}/{len(grid)}", 0.2 + 0.4 * len(fitted) / len(grid))
+
+    leaderboard = rank_candidates([entry for entry, _, _ in fitted], metric)
+    best_entry, best_model, best_labels = next(candidate for candidate in fitted if candidate[0] is leaderboard[0])
+    if best_model is None:
+        raise ValueError(f"Every sweep candidate failed, e.g. {best_entry['error']}")
+
+    result = summarize(model_name, vectorizer, X, best_model, best_labels, references, best_entry["metrics"], progress)
+    result["hyperparameters"] = best_entry["hyperparameters"]
+    result["diagnostics"].update(
+        hyperparameters=best_entry["hyperparameters"],
+        rank_metric=metric,
+        feature_cache_hit=cache_hit,
+        leaderboard=leaderboard,
+    )
+    return result
@@ -0,0 +1,323 @@
+import os
+from contextlib import contextmanager
+
+import joblib
+import numpy as np
+import scipy.sparse as sp
+from sklearn.cluster import KMeans, DBSCAN, AgglomerativeClustering
+from sklearn.decomposition import TruncatedSVD
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+from ml import sweep
+from ml.artifacts import save_bundle
+from ml.datasets import TEXT_COLUMN, load_dataset
+from ml.inference import DEPARTMENT_MAPPING, UNRECOGNIZED_DEPARTMENT, CentroidTable
+from ml.metrics import cluster_metrics
+from ml.registry import MODEL_FOLDER, VECTORIZER_FILE
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+PLOT_FOLDER = os.path.join("static", "plots")
+CLUSTERED_DATASET = "clustered_dataset.csv"
+PUBLISH_LOCK_PATH = os.path.join("instance", "training_publish.lock")
+
+MAX_FEATURES = 2000
+NGRAM_RANGE = (1, 2)
+MODEL_NAMES = ("kmeans", "dbscan", "hierarchical")
+SVD_COMPONENTS = 100  # Dense projection agglomerative clustering is fitted on
+LABEL_COLUMN = "Department"  # Known department names; clustered_dataset.csv's Cluster column is model output, not a label
+
+
+def _noop_progress(stage, fraction):
+    pass
+
+
+def fit_vectorizer(descriptions, max_features=MAX_FEATURES, ngram_range=NGRAM_RANGE):
+    """Fits the TF-IDF vectorizer and returns it with the sparse feature matrix."""
+    tfidf = TfidfVectorizer(max_features=max_features, ngram_range=tuple(ngram_range))
+    X = tfidf.fit_transform(descriptions)
+    return tfidf, X
+
+
+def reduce_dimensions(X, n_components, random_state=42):
+    """Projects the sparse matrix with TruncatedSVD, capped by the matrix shape."""
+    n_components = max(1, min(n_components, min(X.shape) - 1))
+    return TruncatedSVD(n_components=n_components, random_state=random_state).fit_transform(X)
+
+
+def build_model(model_name, hyperparameters=None):
+    """Creates an unfitted clusterer from form-style (string) hyperparameters."""
+    hyperparameters = hyperparameters or {}
+    model_name = model_name.lower()
+
+    if model_name == "kmeans":
+        return KMeans(n_clusters=int(hyperparameters.get("n_clusters", 5)), random_state=42, n_init=10)
+    if model_name == "dbscan":
+        return DBSCAN(
+            eps=float(hyperparameters.get("eps", 0.5)),
+            min_samples=int(hyperparameters.get("min_samples", 5)),
+            metric="euclidean",
+        )
+    if model_name == "hierarchical":
+        return AgglomerativeClustering(n_clusters=int(hyperparameters.get("n_clusters", 5)))
+    raise ValueError(f"Unknown model: {model_name}")
+
+
+def fit_model(model_name, X, hyperparameters=None, reduced=None):
+    """Fits ``model_name`` on ``X`` and returns (model, cluster labels).
+
+    ``reduced`` is an already computed SVD projection of ``X``, so a sweep
+    over agglomerative candidates projects the matrix only once.
+    """
+    model = build_model(model_name, hyperparameters)
+    if isinstance(model, AgglomerativeClustering):
+        # Agglomerative needs dense input, so fit it on a reduced SVD representation
+        labels = model.fit_predict(reduce_dimensions(X, SVD_COMPONENTS) if reduced is None else reduced)
+    else:
+        labels = model.fit_predict(X)
+    return model, np.asarray(labels)
+
+
+def reference_departments(df):
+    """The known department of every training row, or None when the data has no ``Department`` column.
+
+    Rows without a usable label are None. The ``Cluster`` column of
+    clustered_dataset.csv is deliberately ignored: it holds a previous run's
+    arbitrary cluster ids, and learning from it would only reproduce that run.
+    """
+    if LABEL_COLUMN not in df.columns:
+        return None
+    return [str(value) if isinstance(value, str) and value.strip() else None for value in df[LABEL_COLUMN]]
+
+
+def learn_label_map(labels, references):
+    """Maps every fitted cluster to the department most of its labelled rows belong to.
+
+    Returns ``(label_map, votes)``, where ``votes`` counts the labelled rows
+    behind each cluster's department. Clusters with no votes keep the default
+    ``DEPARTMENT_MAPPING`` entry; DBSCAN noise (-1) is never mapped.
+    """
+    labels = np.asarray(labels)
+    clusters = np.unique(labels[labels != -1])
+    label_map = {int(cluster): DEPARTMENT_MAPPING.get(int(cluster), UNRECOGNIZED_DEPARTMENT) for cluster in clusters}
+    label_votes = {int(cluster): 0 for cluster in clusters}
+    if references is None or not len(clusters):
+        return label_map, label_votes
+
+    known = np.array([reference is not None for reference in references]) & (labels != -1)
+    if not known.any():
+        return label_map, label_votes
+    departments, department_index = np.unique(np.asarray(references, dtype=object)[known].astype(str), return_inverse=True)
+    cluster_index = np.searchsorted(clusters, labels[known])
+
+    # ✅ One sparse contingency table instead of a Python loop per cluster; ties go to the first name
+    votes = sp.coo_matrix(
+        (np.ones(len(cluster_index)), (cluster_index, department_index)),
+        shape=(len(clusters), len(departments)),
+    ).toarray()
+    for row, cluster in enumerate(clusters):
+        if votes[row].any():
+            label_map[int(cluster)] = str(departments[np.argmax(votes[row])])
+            label_votes[int(cluster)] = int(votes[row].max())
+    return label_map, label_votes
+
+
+def build_centroid_table(model, X, labels, label_map, label_votes=None):
+    """The centroid matrix used at inference time, one row per fitted cluster.
+
+    K-Means keeps its own centres; other models get the mean TF-IDF vector of
+    each cluster's training rows, so agglomerative clustering (fitted on an
+    SVD projection) can still be applied to new descriptions.
+    """
+    labels = np.asarray(labels)
+    clusters = np.array(sorted(label_map), dtype=np.int64)
+    if hasattr(model, "cluster_centers_"):
+        centroids = np.asarray(model.cluster_centers_)[clusters]
+    else:
+        rows = np.flatnonzero(labels != -1)
+        membership = sp.csr_matrix(
+            (np.ones(len(rows)), (np.searchsorted(clusters, labels[rows]), rows)),
+            shape=(len(clusters), X.shape[0]),
+        )
+        sizes = np.asarray(membership.sum(axis=1)).ravel()
+        centroids = np.asarray((membership @ X).todense()) / np.maximum(sizes, 1)[:, None]
+    votes = [(label_votes or {}).get(int(cluster), 0) for cluster in clusters]
+    return CentroidTable(clusters, centroids, [label_map[int(cluster)] for cluster in clusters], votes)
+
+
+def diagnostics(X, labels, metrics=None):
+    """Cluster counts and quality scores for a fitted labelling; ``metrics`` skips recomputing the scores."""
+    clusters, sizes = np.unique(labels, return_counts=True)
+    cluster_sizes = dict(zip(clusters.tolist(), sizes.tolist()))
+    result = {
+        "n_samples": int(X.shape[0]),
+        "n_features": int(X.shape[1]),
+        "n_clusters": int(sum(1 for cluster in clusters if cluster != -1)),
+        "n_noise": int(cluster_sizes.get(-1, 0)),
+        "cluster_sizes": {str(cluster): int(size) for cluster, size in cluster_sizes.items()},
+    }
+    result.update(cluster_metrics(X, labels, dunn_method="centroid") if metrics is None else metrics)
+    return result
+
+
+def summarize(model_name, vectorizer, X, model, labels, references=None, metrics=None, progress=None):
+    """Labels, evaluates and projects a fitted model into the result dict ``train`` returns."""
+    progress = progress or _noop_progress
+
+    progress("labelling", 0.6)
+    label_map, label_votes = learn_label_map(labels, references)
+    table = build_centroid_table(model, X, labels, label_map, label_votes)
+
+    progress("evaluating", 0.7)
+    result_diagnostics = diagnostics(X, labels, metrics)
+    result_diagnostics["label_map"] = {str(cluster): department for cluster, department in label_map.items()}
+    result_diagnostics["label_votes"] = {str(cluster): votes for cluster, votes in label_votes.items()}
+    # ✅ Defaults from DEPARTMENT_MAPPING, never trusted by the local routing tier
+    result_diagnostics["unlearned_clusters"] = [cluster for cluster, votes in label_votes.items() if not votes]
+    return {
+        "model_name": model_name.lower(),
+        "vectorizer": vectorizer,
+        "model": model,
+        "X": X,
+        "labels": labels,
+        "table": table,
+        "projection": reduce_dimensions(X, 2),
+        "diagnostics": result_diagnostics,
+    }
+
+
+def train(df, model_name, hyperparameters=None, text_column=TEXT_COLUMN, max_features=MAX_FEATURES, ngram_range=NGRAM_RANGE, progress=None):
+    """Vectorizes ``df[text_column]`` and fits ``model_name`` on it.
+
+    Returns a dict with the fitted ``vectorizer`` and ``model``, the training
+    ``labels``, the ``table`` of centroids and learned departments, a 2-D
+    ``projection`` for plotting and ``diagnostics``.
+    """
+    progress = progress or _noop_progress
+
+    progress("vectorizing", 0.2)
+    tfidf, X = fit_vectorizer(df[text_column], max_features, ngram_range)
+
+    progress("fitting", 0.4)
+    model, labels = fit_model(model_name, X, hyperparameters)
+
+    return summarize(model_name, tfidf, X, model, labels, reference_departments(df), progress=progress)
+
+
+def dump_atomic(obj, path):
+    """joblib.dump via a temporary file so readers never see a partial pickle."""
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    joblib.dump(obj, tmp_path)
+    os.replace(tmp_path, path)
+
+
+def save_artifacts(result, folder=MODEL_FOLDER, save_vectorizer=True):
+    """Writes the fitted model (and vectorizer) where the model registry looks for them.
+
+    The pickles stay for the notebooks; the registry prefers the memory-mappable bundle.
+    """
+    os.makedirs(folder, exist_ok=True)
+    model_path = os.path.join(folder, f"{result['model_name']}_model.pkl")
+    if save_vectorizer:
+        dump_atomic(result["vectorizer"], os.path.join(folder, VECTORIZER_FILE))
+    dump_atomic(result["model"], model_path)
+    save_bundle(result["model_name"], result["model"], result["vectorizer"], folder, table=result.get("table"))
+    return model_path
+
+
+@contextmanager
+def publish_lock(path=PUBLISH_LOCK_PATH):
+    """Exclusive lock, across processes, for writing a job's outputs to the shared files.
+
+    Jobs fit concurrently, but the model, vectorizer, plot and
+    clustered_dataset.csv of one job are published together, never
+    interleaved with another job's.
+    """
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "a+") as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        else:
+            msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+            else:
+                lock_file.seek(0)
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def save_plot(result, title=None, folder=PLOT_FOLDER):
+    """Saves the 2-D cluster scatter plot shown on the train page."""
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    os.makedirs(folder, exist_ok=True)
+    projection = result["projection"]
+    plt.figure(figsize=(6, 5))
+    scatter = plt.scatter(projection[:, 0], projection[:, 1], c=result["labels"], cmap="viridis", s=100)
+    plt.legend(*scatter.legend_elements(), title="Cluster")
+    plt.xlabel("PCA1")
+    plt.ylabel("PCA2")
+    plt.title(title or f"{result['model_name']} clustering")
+    path = os.path.join(folder, f"{result['model_name']}_plot.png")
+    tmp_path = f"{path}.{os.getpid()}.tmp.png"
+    plt.savefig(tmp_path)
+    plt.close()
+    os.replace(tmp_path, path)
+    return path
+
+
+def plot_title(model_name, hyperparameters):
+    hyperparameters = hyperparameters or {}
+    if model_name == "kmeans":
+        return f"K-Means Clustering ({int(hyperparameters.get('n_clusters', 5))} Clusters)"
+    if model_name == "dbscan":
+        return f"DBSCAN Clustering (eps={float(hyperparameters.get('eps', 0.5))}, min_samples={int(hyperparameters.get('min_samples', 5))})"
+    return f"Hierarchical Clustering ({int(hyperparameters.get('n_clusters', 5))} Clusters)"
+
+
+def run_training(params, progress=None):
+    """Runs a full training job from a train_params.json-style dict and returns its diagnostics.
+
+    Hyperparameters with several comma-separated values make it a sweep (see
+    ml.sweep); the best candidate is saved and its diagnostics carry the leaderboard.
+    """
+    progress = progress or _noop_progress
+    model_name = params.get("model", "kmeans").lower()
+    hyperparameters = params.get("hyperparameters", {})
+    grid = sweep.parameter_grid(hyperparameters)
+
+    progress("loading", 0.1)
+    df = load_dataset(params["dataset_path"])
+
+    if len(grid) > 1:
+        result = sweep.run_sweep(
+            df, model_name, grid, params["dataset_path"],
+            metric=params.get("metric"), n_jobs=params.get("n_jobs", -1), progress=progress,
+        )
+        hyperparameters = result["hyperparameters"]
+    else:
+        hyperparameters = grid[0]
+        result = train(df, model_name, hyperparameters, progress=progress)
+
+    df["PCA1"] = result["projection"][:, 0]
+    df["PCA2"] = result["projection"][:, 1] if result["projection"].shape[1] > 1 else 0.0
+    df["Cluster"] = result["labels"]
+
+    progress("saving", 0.9)
+    with publish_lock():
+        save_artifacts(result)
+        save_plot(result, plot_title(model_name, hyperparameters))
+        tmp_path = f"{CLUSTERED_DATASET}.{os.getpid()}.tmp"
+        df.to_csv(tmp_path, index=False)
+        os.replace(tmp_path, CLUSTERED_DATASET)
+
+    return result["diagnostics"]
@@ -1,6 +1,14 @@
-from datetime import datetime
+import os
+import socket
+import uuid
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from sqlalchemy import and_, or_
 from models import db
 
+DEFAULT_LEASE_SECONDS = 300
+ROUTING_FAILED_TIER = "failed"  # routing_tier of issues parked after too many failed routing attempts
+
 
 class Issue(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -10,3 +18,150 @@ class Issue(db.Model):
     department = db.Column(db.String(100))
     sent_to_department = db.Column(db.Boolean, default=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    processing_owner = db.Column(db.String(100))  # Process currently routing this issue
+    lease_until = db.Column(db.DateTime)  # The claim expires after this, so a crashed owner cannot block it
+    escalation_level = db.Column(db.Integer, default=0, nullable=False)  # Overdue tiers already notified
+    escalated_at = db.Column(db.DateTime)  # When the last overdue notice went out
+    routing_tier = db.Column(db.String(20))  # "local" (ML model) or "llm", whichever assigned the department
+    routing_attempts = db.Column(db.Integer, default=0, nullable=False)  # Sweeps whose routing of this issue failed
+
+    __table_args__ = (
+        # Unsent issues in id order: the routing sweep only touches the pending tail of the table
+        db.Index(
+            "ix_issue_unsent", "id",
+            sqlite_where=sent_to_department == False,  # noqa: E712
+            postgresql_where=sent_to_department == False,  # noqa: E712
+        ),
+        db.Index("ix_issue_escalation_due", "status", "escalation_level", "created_at"),  # Overdue scan
+        db.Index("ix_issue_user_id_id", "user_id", "id"),  # A user's reports, in id order
+    )
+
+
+def lease_owner():
+    """A claim token unique to this process and call."""
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:12]}"
+
+
+def claimable_filter(now, after_id=0):
+    """Conditions for unsent issues that nobody holds a valid lease on and that are not parked as failed.
+
+    ``sent_to_department == False`` must stay spelled exactly like the
+    ``ix_issue_unsent`` predicate, or SQLite will not use the partial index.
+    """
+    return [
+        Issue.sent_to_department == False,  # noqa: E712
+        or_(Issue.lease_until.is_(None), Issue.lease_until < now),
+        or_(Issue.routing_tier.is_(None), Issue.routing_tier != ROUTING_FAILED_TIER),
+        Issue.id > after_id,
+    ]
+
+
+def claim_unsent_issues(batch_size, lease_seconds=DEFAULT_LEASE_SECONDS, after_id=0, issue_ids=None):
+    """Atomically leases up to ``batch_size`` unsent issues and returns them.
+
+    A single UPDATE marks the rows with a fresh owner token, so two processes
+    (or overlapping sweeps) can never claim the same issue while its lease is
+    valid. Returned issues are plain snapshots; hand their new values to
+    ``complete_claimed_issues`` to store them and release the lease.
+    """
+    now = datetime.utcnow()
+    owner = lease_owner()
+    claimable = claimable_filter(now, after_id)
+    if issue_ids is not None:
+        claimable.append(Issue.id.in_(issue_ids))
+
+    candidates = db.select(Issue.id).where(*claimable).order_by(Issue.id).limit(batch_size)
+    db.session.execute(
+        db.update(Issue)
+        .where(Issue.id.in_(candidates.scalar_subquery()), *claimable)
+        .values(processing_owner=owner, lease_until=now + timedelta(seconds=lease_seconds))
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+
+    rows = db.session.execute(
+        db.select(
+            Issue.id, Issue.description, Issue.status, Issue.department, Issue.routing_tier,
+            Issue.routing_attempts, Issue.created_at, Issue.processing_owner,
+        )
+        .where(Issue.processing_owner == owner)
+        .order_by(Issue.id)
+    ).all()
+    return [SimpleNamespace(**row._asdict()) for row in rows]
+
+
+def iter_claimed_issue_batches(batch_size, lease_seconds=DEFAULT_LEASE_SECONDS):
+    """Yields batches of freshly claimed unsent issues in id order.
+
+    Paging by id keeps memory bounded on large backlogs and never revisits a
+    row in the same sweep, even when it is released unsent.
+    """
+    last_id = 0
+    while True:
+        batch = claim_unsent_issues(batch_size, lease_seconds, after_id=last_id)
+        if not batch:
+            return
+        yield batch
+        last_id = batch[-1].id
+
+
+def renew_claimed_issues(issues, lease_seconds=DEFAULT_LEASE_SECONDS):
+    """Extends the lease on claimed ``issues`` and returns the ones this process still holds.
+
+    An issue whose lease ran out and that another process has claimed since
+    is left out, so the caller does not email it a second time.
+    """
+    if not issues:
+        return []
+    owner = issues[0].processing_owner
+    ids = [issue.id for issue in issues]
+    db.session.execute(
+        db.update(Issue)
+        .where(Issue.id.in_(ids), Issue.processing_owner == owner)
+        .values(lease_until=datetime.utcnow() + timedelta(seconds=lease_seconds))
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+    held = set(db.session.scalars(db.select(Issue.id).where(Issue.id.in_(ids), Issue.processing_owner == owner)))
+    return [issue for issue in issues if issue.id in held]
+
+
+def complete_claimed_issues(issues):
+    """Stores department/sent state for claimed issues and releases their leases in one commit."""
+    db.session.bulk_update_mappings(Issue, [
+        {
+            "id": issue.id,
+            "department": issue.department,
+            "routing_tier": issue.routing_tier,
+            "routing_attempts": issue.routing_attempts,
+            "sent_to_department": bool(getattr(issue, "sent_to_department", False)),
+            "processing_owner": None,
+            "lease_until": None,
+        }
+        for issue in issues
+    ])
+    db.session.commit()
+
+
+def escalation_due_filter(now, tiers_days):
+    """Conditions for issues that have passed their next overdue tier.
+
+    ``tiers_days`` are ages in days, oldest last; an issue at escalation
+    level ``n`` is due once it is older than ``tiers_days[n]``. Each branch
+    is an equality on ``escalation_level`` plus a range on ``created_at``,
+    so ``ix_issue_escalation_due`` answers it without touching issues that
+    were already notified.
+    """
+    return [
+        Issue.status == "Pending",
+        or_(*(
+            and_(Issue.escalation_level == level, Issue.created_at <= now - timedelta(days=days))
+            for level, days in enumerate(tiers_days)
+        )),
+    ]
+
+
+def escalation_level_for(created_at, now, tiers_days):
+    """How many overdue tiers an issue created at ``created_at`` has passed by ``now``."""
+    age = now - created_at
+    return sum(1 for days in tiers_days if age >= timedelta(days=days))
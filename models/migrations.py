@@ -0,0 +1,58 @@
+from datetime import datetime
+from sqlalchemy import inspect, text
+from models import db
+
+# Indexes older versions created that the models no longer declare
+RETIRED_INDEXES = {
+    "issue": ["ix_issue_status_created_at"],
+}
+
+
+def upgrade_schema():
+    """Adds model columns and indexes that an existing database file is missing.
+
+    ``db.create_all`` only creates missing tables, so databases created by an
+    older version keep their old columns and indexes. Missing columns are
+    added as nullable and back-filled with the column default. Must run
+    inside an app context.
+    """
+    inspector = inspect(db.engine)
+    existing_tables = set(inspector.get_table_names())
+
+    with db.engine.begin() as connection:
+        for table in db.metadata.sorted_tables:
+            if table.name not in existing_tables:
+                continue
+            existing_columns = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing_columns:
+                    continue
+                column_type = column.type.compile(dialect=db.engine.dialect)
+                connection.execute(text(f'ALTER TABLE "{table.name}" ADD COLUMN "{column.name}" {column_type}'))
+                backfill = _default_value(column)
+                if backfill is not None:
+                    connection.execute(
+                        text(f'UPDATE "{table.name}" SET "{column.name}" = :value WHERE "{column.name}" IS NULL'),
+                        {"value": backfill},
+                    )
+                print(f"✅ Added column {table.name}.{column.name}")
+
+            existing_indexes = {index["name"] for index in inspector.get_indexes(table.name)}
+            for name in RETIRED_INDEXES.get(table.name, []):
+                if name in existing_indexes:
+                    connection.execute(text(f'DROP INDEX "{name}"'))
+                    print(f"✅ Dropped index {name}")
+            for index in table.indexes:
+                if index.name not in existing_indexes:
+                    index.create(connection)
+                    print(f"✅ Added index {index.name}")
+
+
+def _default_value(column):
+    default = column.default
+    if default is None:
+        return None
+    if default.is_callable:
+        # Callable defaults (e.g. datetime.utcnow) take a context argument we do not have
+        return datetime.utcnow() if column.type.python_type is datetime else None
+    return default.arg
@@ -13,3 +13,56 @@ class Config:
     MAIL_USE_TLS = True 
     MAIL_USE_SSL = False
     EMAIL_SENDER = "noreply@yourapp.com"  
+
+    ROUTING_BATCH_SIZE = 500  # Unsent issues claimed, routed and committed per batch
+    ISSUE_LEASE_SECONDS = 300  # A claimed batch is released to other processes after this; renewed while sending
+    ESCALATION_TIERS_DAYS = (14, 21, 30)  # Pending issues are escalated once as they pass each age
+    ESCALATION_DIGEST = False  # True sends one overdue digest per recipient instead of one email per issue
+    USER_REPORTS_PAGE_SIZE = 100  # /api/issues/user-reports page size when no limit is given
+    USER_REPORTS_MAX_PAGE_SIZE = 1000
+    BULK_INSERT_CHUNK_SIZE = 1000  # Rows parsed, classified and committed together by /api/issues/bulk
+
+    METRICS_MEMORY_BUDGET_MB = 256  # Working memory for blockwise distance computations in /api/models/test
+    METRICS_SILHOUETTE_SAMPLE_SIZE = 10000  # Silhouette is computed on a sample above this many rows
+    METRICS_DUNN_EXACT_MAX_ROWS = 50000  # Larger test files use the centroid Dunn index shortcut
+
+    DATASET_CHUNK_SIZE = 5000  # Rows read, vectorized and predicted per batch when testing on an upload
+
+    TRAINING_WORKERS = 2  # Training jobs fit in parallel in this many worker processes; saving is serialized
+    SWEEP_N_JOBS = max(1, (os.cpu_count() or 1) // TRAINING_WORKERS)  # joblib n_jobs per sweep; jobs share the cores
+    SWEEP_MAX_CANDIDATES = 50  # Largest parameter grid /api/models/train accepts
+    STREAM_POLL_INTERVAL = 0.5  # How often streamed training progress checks the job status
+    STREAM_HEARTBEAT_SECONDS = 15  # Idle progress streams send a heartbeat so proxies keep them open
+
+    INCREMENTAL_TRAINING = False  # Feed new issues to the minibatch model on every background sweep
+
+    MAIL_POOL_SIZE = 4  # Persistent SMTP sessions kept open per process
+    MAIL_SENDER_THREADS = 4  # Messages sent concurrently by MailDispatcher.send_many
+    MAIL_MAX_RETRIES = 3  # Retries for dropped connections and 4xx replies
+    MAIL_RETRY_BACKOFF = 1.0  # Seconds before the first retry, doubled on each further retry
+    MAIL_MAX_MESSAGES_PER_CONNECTION = 100  # Sessions are recycled after this many messages
+
+    GROQ_MODEL = "mistral-saba-24b"
+    GROQ_BASE_URL = None  # Point at a local fake completion server for testing
+    ROUTING_CONCURRENCY = 8  # Simultaneous LLM routing calls
+    ROUTING_REQUESTS_PER_SECOND = 5.0  # Token-bucket rate limit shared by routing threads
+    ROUTING_MAX_RETRIES = 3  # Retries for timeouts, 429s and 5xx replies
+    ROUTING_MAX_ATTEMPTS = 5  # Failed sweeps before an issue is parked as "failed" and the Super Focal Person alerted
+    ROUTING_RETRY_BACKOFF = 0.5  # Upper bound (seconds) of the first jittered retry delay
+    ROUTING_TIMEOUT = 20.0  # Per-call timeout in seconds
+
+    ROUTING_CACHE_ENABLED = True  # Reuse earlier LLM decisions for identical (normalized) descriptions
+    ROUTING_CACHE_PATH = "instance/routing_cache.db"
+    ROUTING_CACHE_TTL_DAYS = 30
+    ROUTING_CACHE_MAX_ENTRIES = 100000  # Least recently used entries are evicted above this
+    ROUTING_CACHE_SIMILARITY = None  # e.g. 0.9 enables the TF-IDF near-duplicate lookup
+    ROUTING_LOCAL_CONFIDENCE = None  # e.g. 0.1: local answers at or above this margin skip the LLM (needs a model trained on labelled data)
+
+    METRICS_ENABLED = os.environ.get("METRICS_ENABLED", "1") != "0"  # 0 turns timers and counters into no-ops
+    METRICS_WINDOW = 1024  # Recent observations per series that /api/metrics quantiles are computed from
+
+    PIPELINE_ENABLED = os.environ.get("PIPELINE_ENABLED", "1") != "0"  # 0 for scripts that only import the app
+    PIPELINE_LOCK_PATH = "instance/issue_pipeline.lock"  # Held by the one process that routes issues
+    PIPELINE_SIGNAL_PATH = "instance/issue_pipeline.signal"  # Touched by other processes on new reports
+    PIPELINE_POLL_INTERVAL = 0.5  # Seconds between checks for queued issues and signals
+    PIPELINE_RECONCILE_INTERVAL = 300  # Seconds between full safety-net sweeps
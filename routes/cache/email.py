@@ -1,28 +1,48 @@
 import difflib
-import smtplib
+import hashlib
+import time
 from email.message import EmailMessage
-from datetime import datetime, timedelta
-from groq import Groq
-from models.issue import Issue
+from datetime import datetime
+from models.issue import (
+    ROUTING_FAILED_TIER,
+    Issue,
+    claim_unsent_issues,
+    complete_claimed_issues,
+    escalation_due_filter,
+    escalation_level_for,
+    iter_claimed_issue_batches,
+    renew_claimed_issues,
+)
 from models import db
 from routes.cache.config import Config
+from routes.cache.instrumentation import metrics
+from routes.cache.mailer import get_dispatcher
+from routes.cache.routing import RoutingEngine, RoutingStats
+from routes.cache.routing_cache import RoutingCache
 
 groq_api_key = Config.GROQ_API_KEY
 
-SMTP_SERVER = Config.MAIL_SERVER
-SMTP_PORT = Config.MAIL_PORT
-EMAIL_USERNAME = Config.MAIL_USERNAME
-EMAIL_PASSWORD = Config.MAIL_PASSWORD
 EMAIL_SENDER = Config.EMAIL_SENDER
 
 SUPER_FOCAL_EMAIL = "trendbussiness.3915@gmail.com"
 
 client = None
-if groq_api_key:
-    try:
-        client = Groq(api_key=groq_api_key)
-    except Exception:
-        print("")
+
+routing_stats = RoutingStats()
+
+
+def get_client():
+    """Builds the Groq client on first use, so importing this module stays cheap."""
+    global client
+    if client is None and groq_api_key:
+        try:
+            from groq import Groq
+
+            # ✅ Retries are handled by the routing engine, not inside the SDK
+            client = Groq(api_key=groq_api_key, base_url=Config.GROQ_BASE_URL, max_retries=0)
+        except Exception as e:
+            print(f"❌ Error initializing Groq client: {e}")
+    return client
 
 department_mapping = {
     "police department": "Police Department",
@@ -32,6 +52,8 @@ department_mapping = {
     "traffic police department": "Traffic Police Department",
 }
 
+LLM_DEPARTMENTS = frozenset(department_mapping.values())
+
 SYSTEM_PROMPT = {
     "role": "system",
     "content": (
@@ -53,32 +75,61 @@ def closest_match(department):
 
 
 def verify_groq_api():
-    return bool(client)
+    return get_client() is not None
+
+
+_routing_engine = None
+
+
+def get_routing_engine():
+    """Returns the shared concurrent routing engine, creating it on first use."""
+    global _routing_engine
+    if _routing_engine is None:
+        _routing_engine = RoutingEngine(
+            get_client(),
+            Config.GROQ_MODEL,
+            SYSTEM_PROMPT,
+            normalize=closest_match,
+            max_concurrency=Config.ROUTING_CONCURRENCY,
+            requests_per_second=Config.ROUTING_REQUESTS_PER_SECOND,
+            max_retries=Config.ROUTING_MAX_RETRIES,
+            backoff_seconds=Config.ROUTING_RETRY_BACKOFF,
+            timeout=Config.ROUTING_TIMEOUT,
+            cache=_build_routing_cache() if Config.ROUTING_CACHE_ENABLED else None,
+        )
+    return _routing_engine
 
 
-def get_department_routing(user_query):
-    if not verify_groq_api():
-        return "API key is missing or invalid."
+def _active_vectorizer():
+    from ml.registry import registry
+    bundle = registry.get()
+    return bundle.vectorizer if bundle else None
 
-    try:
-        messages = [SYSTEM_PROMPT, {"role": "user", "content": user_query}]
 
-        chat_completion = client.chat.completions.create(
-            messages=messages, model="mistral-saba-24b"
-        )
+def _build_routing_cache():
+    """Cache keyed by prompt and model, so changing either starts from a clean slate."""
+    version = hashlib.sha256(f"{Config.GROQ_MODEL}\0{SYSTEM_PROMPT['content']}".encode("utf-8")).hexdigest()[:16]
+    return RoutingCache(
+        Config.ROUTING_CACHE_PATH,
+        version,
+        ttl_seconds=Config.ROUTING_CACHE_TTL_DAYS * 24 * 3600,
+        max_entries=Config.ROUTING_CACHE_MAX_ENTRIES,
+        similarity_threshold=Config.ROUTING_CACHE_SIMILARITY,
+        vectorizer_provider=_active_vectorizer,
+    )
 
-        department = chat_completion.choices[0].message.content.strip()
-        return closest_match(department)
 
-    except Exception:
-        return ""
+def get_department_routing(user_query):
+    if not verify_groq_api():
+        return "API key is missing or invalid."
 
+    return get_routing_engine().route(user_query) or ""
 
-def send_email(issue):
-    """Send the main department email."""
-    try:
-        subject = f"New Issue Report - {issue.department}"
-        body = f"""
+
+def build_issue_email(issue):
+    """Build the main department email."""
+    subject = f"New Issue Report - {issue.department}"
+    body = f"""
         🚨 New Issue Report 🚨
         ---------------------------------
         📌 Report ID: {issue.id}
@@ -88,30 +139,19 @@ def send_email(issue):
         ---------------------------------
         """
 
-        msg = EmailMessage()
-        msg.set_content(body)
-        msg["Subject"] = subject
-        msg["From"] = EMAIL_SENDER
-        msg["To"] = "trendbussiness.3915@gmail.com"
-
-        server = smtplib.SMTP(SMTP_SERVER, SMTP_PORT)
-        server.starttls()
-        server.login(EMAIL_USERNAME, EMAIL_PASSWORD)
-        server.send_message(msg)
-        server.quit()
-
-        print(f"📧 Email sent successfully for Report ID {issue.id}")
-        return True
+    msg = EmailMessage()
+    msg.set_content(body)
+    msg["Subject"] = subject
+    msg["From"] = EMAIL_SENDER
+    msg["To"] = "trendbussiness.3915@gmail.com"
+    return msg
 
-    except Exception as e:
-        print(f"❌ Failed to send email for Report ID {issue.id}: {e}")
-        return False
 
-def notify_super_focal(issue):
-    try:
-        subject = f"⚠️ Overdue Issue (14 days)  Report ID {issue.id}"
-        body = f"""
-        ⚠️ Pending Issue Exceeded 14 Days ⚠️
+def build_overdue_email(issue, days=Config.ESCALATION_TIERS_DAYS[0]):
+    """Build the overdue notice for the Super Focal Person."""
+    subject = f"⚠️ Overdue Issue ({days} days)  Report ID {issue.id}"
+    body = f"""
+        ⚠️ Pending Issue Exceeded {days} Days ⚠️
         ---------------------------------
         📌 Report ID: {issue.id}
         📝 Description: {issue.description}
@@ -122,57 +162,285 @@ def notify_super_focal(issue):
         Immediate attention required.
         """
 
-        msg = EmailMessage()
-        msg.set_content(body)
-        msg["Subject"] = subject
-        msg["From"] = EMAIL_SENDER
-        msg["To"] = SUPER_FOCAL_EMAIL
+    msg = EmailMessage()
+    msg.set_content(body)
+    msg["Subject"] = subject
+    msg["From"] = EMAIL_SENDER
+    msg["To"] = SUPER_FOCAL_EMAIL
+    return msg
 
-        server = smtplib.SMTP(SMTP_SERVER, SMTP_PORT)
-        server.starttls()
-        server.login(EMAIL_USERNAME, EMAIL_PASSWORD)
-        server.send_message(msg)
-        server.quit()
 
+def build_routing_failed_email(issue):
+    """Build the notice for the Super Focal Person that an issue could not be routed."""
+    subject = f"❌ Report ID {issue.id} could not be routed"
+    body = f"""
+        ❌ Routing Failed {issue.routing_attempts} Times ❌
+        ---------------------------------
+        📌 Report ID: {issue.id}
+        📝 Description: {issue.description}
+        📅 Reported On: {issue.created_at.strftime('%Y-%m-%d %H:%M:%S')}
+        ---------------------------------
+        The report will not be retried. Assign its department manually.
+        """
+
+    msg = EmailMessage()
+    msg.set_content(body)
+    msg["Subject"] = subject
+    msg["From"] = EMAIL_SENDER
+    msg["To"] = SUPER_FOCAL_EMAIL
+    return msg
+
+
+def build_overdue_digest(escalations, recipient=SUPER_FOCAL_EMAIL):
+    """Build one overdue notice listing every ``(issue, days)`` escalation."""
+    lines = "\n".join(
+        f"        📌 {issue.id} | {days}+ days | {issue.department or 'Not Assigned'} | "
+        f"{issue.created_at.strftime('%Y-%m-%d')} | {issue.description}"
+        for issue, days in escalations
+    )
+    body = f"""
+        ⚠️ {len(escalations)} Pending Issues Passed An Overdue Deadline ⚠️
+        ---------------------------------
+{lines}
+        ---------------------------------
+        Immediate attention required.
+        """
+
+    msg = EmailMessage()
+    msg.set_content(body)
+    msg["Subject"] = f"⚠️ Overdue Issues Digest ({len(escalations)} reports)"
+    msg["From"] = EMAIL_SENDER
+    msg["To"] = recipient
+    return msg
+
+
+def send_email(issue):
+    """Send the main department email."""
+    if get_dispatcher().send(build_issue_email(issue)):
+        print(f"📧 Email sent successfully for Report ID {issue.id}")
+        return True
+
+    print(f"❌ Failed to send email for Report ID {issue.id}")
+    return False
+
+def notify_super_focal(issue):
+    if get_dispatcher().send(build_overdue_email(issue)):
         print(f"📧 Super Focal Person notified for Report ID {issue.id}")
         return True
 
-    except Exception as e:
-        print(f"❌ Failed to notify Super Focal Person for Report ID {issue.id}: {e}")
-        return False
+    print(f"❌ Failed to notify Super Focal Person for Report ID {issue.id}")
+    return False
 
 
-def process_overdue_issues():
-    fourteen_days_ago = datetime.utcnow() - timedelta(days=14)
+def process_overdue_issues(tiers_days=Config.ESCALATION_TIERS_DAYS, digest=Config.ESCALATION_DIGEST):
+    """Notifies the Super Focal Person once per overdue tier an issue passes.
 
-    overdue_issues = (
-        Issue.query.filter(Issue.status == "Pending")
-        .filter(Issue.created_at <= fourteen_days_ago)
-        .all()
-    )
+    Only issues due for their next tier are loaded; an issue is recorded as
+    escalated only once its notice was sent, so failures retry next sweep.
+    """
+    now = datetime.utcnow()
 
-    if not overdue_issues:
+    due_issues = Issue.query.filter(*escalation_due_filter(now, tiers_days)).order_by(Issue.id).all()
+
+    if not due_issues:
         print("✅ No overdue issues detected.")
         return "No overdue issues."
 
-    for issue in overdue_issues:
-        notify_super_focal(issue)
+    # ✅ An issue that is already past several tiers (e.g. after downtime) gets one notice for the highest
+    levels = [escalation_level_for(issue.created_at, now, tiers_days) for issue in due_issues]
+    escalations = [(issue, tiers_days[level - 1]) for issue, level in zip(due_issues, levels)]
 
-    return f"📢 {len(overdue_issues)} overdue issues forwarded to Super Focal Person."
+    if digest:
+        sent = get_dispatcher().send_many([build_overdue_digest(escalations)]) * len(escalations)
+    else:
+        sent = get_dispatcher().send_many([build_overdue_email(issue, days) for issue, days in escalations])
+
+    escalated = 0
+    for issue, level, was_sent in zip(due_issues, levels, sent):
+        if was_sent:
+            issue.escalation_level = level
+            issue.escalated_at = now
+            escalated += 1
+    db.session.commit()
+
+    return f"📢 {escalated} overdue issues forwarded to Super Focal Person."
+
+
+def get_department_routings(user_queries):
+    """Routes a batch of descriptions concurrently; None marks a failed routing."""
+    return get_routing_engine().route_many(user_queries)
+
+
+def local_routing_enabled():
+    return Config.ROUTING_LOCAL_CONFIDENCE is not None
+
+
+def refresh_selected_model():
+    """Activates the model selected in the database, so a selection saved by another worker is picked up."""
+    if local_routing_enabled():
+        from emails import get_selected_model
+        from ml.registry import registry
+
+        registry.activate(get_selected_model())
+
+
+def get_local_routings(user_queries, threshold=Config.ROUTING_LOCAL_CONFIDENCE):
+    """Departments the local ML model is confident about, None for every other description.
+
+    Only learned labels (see ``classify_with_confidence``) at or above
+    ``threshold`` count, and only departments the LLM could have chosen. All
+    None when ``threshold`` is None, i.e. the local tier is off.
+    """
+    if threshold is None or not user_queries:
+        return [None] * len(user_queries)
+    from emails import classify_issues_with_confidence
+
+    return [
+        # Confidence 0 marks unlearned clusters, so it never passes, not even a threshold of 0
+        department if department in LLM_DEPARTMENTS and confidence > 0 and confidence >= threshold else None
+        for department, confidence in classify_issues_with_confidence(user_queries)
+    ]
+
+
+def get_tiered_routings(user_queries, threshold=Config.ROUTING_LOCAL_CONFIDENCE):
+    """Routes descriptions with the local ML model first and the LLM only for uncertain ones.
+
+    Returns ``(department, tier)`` per description, where tier is "local" or
+    "llm"; a failed routing is ``(None, None)``.
+    """
+    results = [(None, None)] * len(user_queries)
+    uncertain = list(range(len(user_queries)))
+
+    if threshold is not None and user_queries:
+        started = time.perf_counter()
+        uncertain = []
+        for index, department in enumerate(get_local_routings(user_queries, threshold)):
+            if department is not None:
+                results[index] = (department, "local")
+            else:
+                uncertain.append(index)
+        elapsed = time.perf_counter() - started
+        routing_stats.record("local", len(user_queries) - len(uncertain), elapsed)
+        metrics.observe("issue_sweep_stage_seconds", elapsed, stage="classify")
+
+    if uncertain and verify_groq_api():
+        started = time.perf_counter()
+        departments = get_department_routings([user_queries[index] for index in uncertain])
+        elapsed = time.perf_counter() - started
+        routing_stats.record("llm", sum(1 for department in departments if department is not None), elapsed)
+        metrics.observe("issue_sweep_stage_seconds", elapsed, stage="llm")
+        for index, department in zip(uncertain, departments):
+            if department is not None:
+                results[index] = (department, "llm")
+
+    routing_stats.record("failed", sum(1 for department, _ in results if department is None))
+    return results
+
+
+def _renew_lease(issues):
+    """Extends the lease on ``issues``, returning the ones another process has not reclaimed."""
+    held = renew_claimed_issues(issues, Config.ISSUE_LEASE_SECONDS)
+    if len(held) < len(issues):
+        print(f"❌ {len(issues) - len(held)} reports were reclaimed by another process, skipping them.")
+    return held
+
+
+def _send_under_lease(issues, outbox):
+    """Sends ``outbox``, a list of (issue, EmailMessage), while keeping the lease on ``issues``.
+
+    Messages go out one per sender thread at a time, so a wave outlasts half
+    a lease only if every send in it exhausts its retries; the lease is
+    renewed before any wave that starts past that point. Issues another
+    process reclaimed are skipped so they are not emailed twice. Returns the
+    issues still held and ``{issue id: sent}``.
+    """
+    dispatcher = get_dispatcher()
+    wave = max(1, dispatcher.sender_threads)
+
+    # ✅ Routing may have outlived the lease
+    issues = _renew_lease(issues)
+    renewed_at = time.monotonic()
+    held_ids = {issue.id for issue in issues}
+
+    sent = {}
+    for start in range(0, len(outbox), wave):
+        if time.monotonic() - renewed_at > Config.ISSUE_LEASE_SECONDS / 2:
+            issues = _renew_lease(issues)
+            renewed_at = time.monotonic()
+            held_ids = {issue.id for issue in issues}
+        chunk = [(issue, message) for issue, message in outbox[start:start + wave] if issue.id in held_ids]
+        for (issue, _), was_sent in zip(chunk, dispatcher.send_many([message for _, message in chunk])):
+            sent[issue.id] = was_sent
+    return issues, sent
+
+
+def _route_and_send(issues):
+    """Routes claimed ``issues``, emails their departments and stores the results in one commit.
+
+    Returns how many were routed.
+    """
+    # ✅ Issues classified when they were uploaded keep their department; only the rest are routed
+    unrouted = [issue for issue in issues if not issue.department]
+    routings = get_tiered_routings([issue.description for issue in unrouted]) if unrouted else []
+
+    # ✅ Issues whose routing failed are released unsent and retried on the next sweep, up to a limit
+    parked = []
+    for issue, (department, tier) in zip(unrouted, routings):
+        if department is None:
+            issue.routing_attempts = (issue.routing_attempts or 0) + 1
+            if issue.routing_attempts < Config.ROUTING_MAX_ATTEMPTS:
+                print(f"❌ Routing failed for Report ID {issue.id}, will retry.")
+                continue
+            print(f"❌ Routing failed {issue.routing_attempts} times for Report ID {issue.id}, giving up.")
+            issue.routing_tier = ROUTING_FAILED_TIER
+            parked.append(issue)
+            continue
+        issue.department = department
+        issue.routing_tier = tier
+    routed_issues = [issue for issue in issues if issue.department]
+
+    # ✅ One pooled SMTP session per sender thread instead of one handshake per email
+    with metrics.timer("issue_sweep_stage_seconds", stage="build"):
+        outbox = [(issue, build_routing_failed_email(issue)) for issue in parked]
+        outbox += [(issue, build_issue_email(issue)) for issue in routed_issues]
+    with metrics.timer("issue_sweep_stage_seconds", stage="send"):
+        issues, sent = _send_under_lease(issues, outbox)
+    for issue in routed_issues:
+        if issue.id in sent:
+            issue.sent_to_department = sent[issue.id]
+
+            if sent[issue.id]:
+                print(f"📧 Email sent successfully for Report ID {issue.id}")
+
+    with metrics.timer("issue_sweep_stage_seconds", stage="commit"):
+        complete_claimed_issues(issues)
+    return sum(1 for issue in routed_issues if issue.id in sent)
+
+
+def process_issue_ids(issue_ids):
+    """Routes specific, newly reported issues (those still unsent and unclaimed)."""
+    if not verify_groq_api() and not local_routing_enabled():
+        return "Groq API not initialized. Cannot process issues."
 
+    refresh_selected_model()
+    with metrics.timer("issue_sweep_stage_seconds", stage="claim"):
+        issues = claim_unsent_issues(len(issue_ids), Config.ISSUE_LEASE_SECONDS, issue_ids=issue_ids)
+    return f"{_route_and_send(issues) if issues else 0} reports processed."
 
-def process_unsent_issues():
-    if not verify_groq_api():
+
+def process_unsent_issues(batch_size=Config.ROUTING_BATCH_SIZE):
+    if not verify_groq_api() and not local_routing_enabled():
         return "Groq API not initialized. Cannot process issues."
 
-    unsent_issues = Issue.query.filter_by(sent_to_department=False).all()
-    if not unsent_issues:
+    # ✅ Once per sweep, not once per batch or issue
+    refresh_selected_model()
+    processed = 0
+    batches = iter_claimed_issue_batches(batch_size, Config.ISSUE_LEASE_SECONDS)
+    for unsent_issues in metrics.timed_iter(batches, "issue_sweep_stage_seconds", stage="claim"):
+        processed += _route_and_send(unsent_issues)
+
+    if not processed:
         print("✅ No new reports to process.")
         return "No new reports to process."
 
-    for issue in unsent_issues:
-        issue.department = get_department_routing(issue.description)
-        issue.sent_to_department = send_email(issue)
-        db.session.commit()
-
-    return f"{len(unsent_issues)} reports processed."
+    return f"{processed} reports processed."
@@ -0,0 +1,97 @@
+import csv
+import io
+import json
+import os
+from itertools import islice
+from ml.datasets import iter_xlsx_sheet
+
+DESCRIPTION_COLUMNS = ("Description", "description")
+
+FORMATS_BY_EXTENSION = {
+    ".csv": "csv",
+    ".xlsx": "xlsx",
+    ".ndjson": "ndjson",
+    ".jsonl": "ndjson",
+}
+
+FORMATS_BY_MIMETYPE = {
+    "text/csv": "csv",
+    "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet": "xlsx",
+    "application/x-ndjson": "ndjson",
+    "application/jsonl": "ndjson",
+}
+
+
+def detect_format(filename=None, mimetype=None):
+    """Upload format from the file extension, falling back to the MIME type; None if unknown."""
+    if filename:
+        extension = os.path.splitext(filename)[1].lower()
+        if extension in FORMATS_BY_EXTENSION:
+            return FORMATS_BY_EXTENSION[extension]
+    return FORMATS_BY_MIMETYPE.get(mimetype)
+
+
+def _description_index(header):
+    for name in DESCRIPTION_COLUMNS:
+        if name in header:
+            return header.index(name)
+    raise ValueError("Invalid file format. 'Description' column is required")
+
+
+def _row(number, value):
+    """``(row number, description, error)`` with blank descriptions reported as errors."""
+    description = str(value).strip() if value is not None else ""
+    if not description:
+        return number, None, "Description is empty"
+    return number, description, None
+
+
+def iter_csv_rows(stream):
+    reader = csv.reader(io.TextIOWrapper(stream, encoding="utf-8-sig", newline=""))
+    index = _description_index(next(reader, []))
+    for number, values in enumerate(reader, start=1):
+        yield _row(number, values[index] if index < len(values) else None)
+
+
+def iter_xlsx_rows(stream):
+    rows = iter_xlsx_sheet(stream)
+    index = _description_index(next(rows)[1])
+    for number, values in rows:
+        yield _row(number, values[index] if index < len(values) else None)
+
+
+def iter_ndjson_rows(stream):
+    number = 0
+    for line in io.TextIOWrapper(stream, encoding="utf-8-sig"):
+        if not line.strip():
+            continue
+        number += 1
+        try:
+            record = json.loads(line)
+        except ValueError:
+            yield number, None, "Invalid JSON"
+            continue
+        if not isinstance(record, dict):
+            yield number, None, "Expected a JSON object"
+            continue
+        yield _row(number, next((record[name] for name in DESCRIPTION_COLUMNS if name in record), None))
+
+
+ROW_READERS = {
+    "csv": iter_csv_rows,
+    "xlsx": iter_xlsx_rows,
+    "ndjson": iter_ndjson_rows,
+}
+
+
+def iter_upload_chunks(stream, upload_format, chunk_size):
+    """Yields lists of ``(row number, description, error)`` read incrementally from ``stream``.
+
+    Raises ValueError when the file has no description column.
+    """
+    rows = ROW_READERS[upload_format](stream)
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            return
+        yield chunk
@@ -0,0 +1,201 @@
+"""In-process latency histograms and counters, rendered in the Prometheus text format.
+
+Timings are kept as summaries: a cumulative count and sum plus a window of
+the most recent observations, from which p50/p95/p99 are computed at scrape
+time. Every process (web worker, pipeline leader) has its own registry, so
+scrape each process or label them at the collector.
+
+When disabled, ``timer`` hands out one shared no-op context manager and
+``increment``/``observe`` return straight away, so instrumented code pays
+a single attribute check.
+"""
+import threading
+import time
+from collections import deque
+
+from ml.registry import registry
+from routes.cache.config import Config
+
+QUANTILES = (0.5, 0.95, 0.99)
+_DONE = object()
+
+
+class _Summary:
+    def __init__(self, window):
+        self.count = 0
+        self.total = 0.0
+        self.recent = deque(maxlen=window)
+
+    def observe(self, value):
+        self.count += 1
+        self.total += value
+        self.recent.append(value)
+
+    def quantiles(self):
+        ordered = sorted(self.recent)
+        if not ordered:
+            return {}
+        return {q: ordered[min(len(ordered) - 1, int(q * len(ordered)))] for q in QUANTILES}
+
+
+class _NullTimer:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class _Timer:
+    def __init__(self, metrics, name, labels):
+        self.metrics = metrics
+        self.name = name
+        self.labels = labels
+
+    def __enter__(self):
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.metrics.observe(self.name, time.perf_counter() - self._started, **self.labels)
+        return False
+
+
+class Metrics:
+    """Thread-safe registry of named summaries and counters, each keyed by its label values."""
+
+    def __init__(self, enabled=True, window=1024):
+        self.enabled = enabled
+        self.window = window
+        self._lock = threading.Lock()
+        self._summaries = {}
+        self._counters = {}
+        self._help = {}
+
+    def describe(self, name, text):
+        """Sets the ``# HELP`` line of a metric."""
+        self._help[name] = text
+
+    def observe(self, name, value, **labels):
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            summary = self._summaries.get(key)
+            if summary is None:
+                summary = self._summaries[key] = _Summary(self.window)
+            summary.observe(value)
+
+    def increment(self, name, amount=1, **labels):
+        if not self.enabled or not amount:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def timer(self, name, **labels):
+        """``with metrics.timer("x_seconds", stage="send"):`` observes the block's wall time."""
+        if not self.enabled:
+            return _NULL_TIMER
+        return _Timer(self, name, labels)
+
+    def timed_iter(self, iterable, name, **labels):
+        """Yields from ``iterable``, observing the time each item took to produce."""
+        iterator = iter(iterable)
+        while True:
+            with self.timer(name, **labels):
+                item = next(iterator, _DONE)
+            if item is _DONE:
+                return
+            yield item
+
+    def reset(self):
+        with self._lock:
+            self._summaries.clear()
+            self._counters.clear()
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format (version 0.0.4)."""
+        with self._lock:
+            summaries = {key: (s.count, s.total, s.quantiles()) for key, s in self._summaries.items()}
+            counters = dict(self._counters)
+
+        lines = []
+        for name in sorted({name for name, _ in summaries}):
+            lines.extend(self._header(name, "summary"))
+            for (series, labels), (count, total, quantiles) in sorted(summaries.items()):
+                if series != name:
+                    continue
+                for q, value in quantiles.items():
+                    lines.append(f"{name}{_labels(labels + (('quantile', q),))} {value:.6g}")
+                lines.append(f"{name}_sum{_labels(labels)} {total:.6g}")
+                lines.append(f"{name}_count{_labels(labels)} {count}")
+        for name in sorted({name for name, _ in counters}):
+            lines.extend(self._header(name, "counter"))
+            for (series, labels), value in sorted(counters.items()):
+                if series == name:
+                    lines.append(f"{name}{_labels(labels)} {value}")
+        return "\n".join(lines) + "\n"
+
+    def _header(self, name, kind):
+        if name in self._help:
+            yield f"# HELP {name} {self._help[name]}"
+        yield f"# TYPE {name} {kind}"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels) + "}"
+
+
+metrics = Metrics(enabled=Config.METRICS_ENABLED, window=Config.METRICS_WINDOW)
+
+metrics.describe("http_request_seconds", "Flask request handling time by endpoint, method and status")
+metrics.describe("http_requests_total", "Flask requests by endpoint, method and status")
+metrics.describe("issue_sweep_stage_seconds", "Time per stage of routing a batch of unsent issues")
+metrics.describe("issues_routed_total", "Issues routed, by the tier that decided (local, llm) or failed")
+metrics.describe("llm_request_seconds", "Time per LLM routing call, including retries")
+metrics.describe("routing_cache_lookups_total", "Routing cache lookups by result")
+metrics.describe("smtp_send_seconds", "Time to send one email, including retries")
+metrics.describe("emails_total", "Emails by result (sent, failed)")
+metrics.describe("model_load_seconds", "Time to load a model from disk, by artifact format")
+metrics.describe("model_test_stage_seconds", "Time per stage and per metric of /api/models/test")
+
+
+def _observe_model_load(artifact_format, seconds):
+    metrics.observe("model_load_seconds", seconds, format=artifact_format)
+
+
+registry.on_load = _observe_model_load
+
+
+def init_app(app):
+    """Times every request by its route endpoint (e.g. ``issues.report_issue``)."""
+    from flask import g, request
+
+    @app.before_request
+    def _start_timer():
+        if metrics.enabled:
+            g.instrumentation_started = time.perf_counter()
+
+    @app.after_request
+    def _record_request(response):
+        started = g.pop("instrumentation_started", None)
+        if started is not None:
+            # Streamed responses are measured to their first byte; the body is sent after this hook
+            labels = {
+                "endpoint": request.endpoint or "unmatched",
+                "method": request.method,
+                "status": response.status_code,
+            }
+            metrics.observe("http_request_seconds", time.perf_counter() - started, **labels)
+            metrics.increment("http_requests_total", **labels)
+        return response
@@ -0,0 +1,191 @@
+import queue
+import smtplib
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from routes.cache.config import Config
+from routes.cache.instrumentation import metrics
+
+
+class _Session:
+    """One authenticated SMTP connection and how much it has been used."""
+
+    def __init__(self, server):
+        self.server = server
+        self.sent = 0
+        self.last_used = time.monotonic()
+
+    def close(self):
+        try:
+            self.server.quit()
+        except Exception:
+            try:
+                self.server.close()
+            except Exception:
+                pass
+
+
+class MailDispatcher:
+    """Sends email over a pool of persistent SMTP sessions.
+
+    Sessions are reused across messages (one STARTTLS handshake and login per
+    session instead of per email), re-opened when the server drops them, and
+    recycled after ``max_messages_per_connection`` messages. Temporary 4xx
+    replies are retried with exponential backoff; 5xx replies fail fast.
+    """
+
+    def __init__(self, host, port, username=None, password=None, use_tls=True, pool_size=4,
+                 sender_threads=4, max_retries=3, backoff_seconds=1.0, max_messages_per_connection=100,
+                 idle_timeout=60, timeout=30):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.use_tls = use_tls
+        self.sender_threads = sender_threads
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+        self.max_messages_per_connection = max_messages_per_connection
+        self.idle_timeout = idle_timeout
+        self.timeout = timeout
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(pool_size)
+        self._executor = None
+        self._executor_lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config=Config):
+        return cls(
+            config.MAIL_SERVER,
+            config.MAIL_PORT,
+            username=config.MAIL_USERNAME,
+            password=config.MAIL_PASSWORD,
+            use_tls=config.MAIL_USE_TLS,
+            pool_size=config.MAIL_POOL_SIZE,
+            sender_threads=config.MAIL_SENDER_THREADS,
+            max_retries=config.MAIL_MAX_RETRIES,
+            backoff_seconds=config.MAIL_RETRY_BACKOFF,
+            max_messages_per_connection=config.MAIL_MAX_MESSAGES_PER_CONNECTION,
+        )
+
+    def _connect(self):
+        server = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        try:
+            if self.use_tls:
+                server.starttls()
+            if self.username:
+                server.login(self.username, self.password)
+        except Exception:
+            server.close()
+            raise
+        return _Session(server)
+
+    def _acquire(self):
+        self._slots.acquire()
+        try:
+            while True:
+                try:
+                    session = self._idle.get_nowait()
+                except queue.Empty:
+                    return self._connect()
+                if time.monotonic() - session.last_used < self.idle_timeout or self._is_alive(session):
+                    return session
+                session.close()
+        except Exception:
+            self._slots.release()
+            raise
+
+    def _release(self, session, reusable=True):
+        if reusable and session.sent < self.max_messages_per_connection:
+            session.last_used = time.monotonic()
+            self._idle.put(session)
+        else:
+            session.close()
+        self._slots.release()
+
+    @staticmethod
+    def _is_alive(session):
+        try:
+            return session.server.noop()[0] == 250
+        except Exception:
+            return False
+
+    @staticmethod
+    def _is_temporary(error):
+        if isinstance(error, smtplib.SMTPRecipientsRefused):
+            return all(400 <= code < 500 for code, _ in error.recipients.values())
+        return 400 <= getattr(error, "smtp_code", 0) < 500
+
+    def send(self, msg):
+        """Sends one EmailMessage, returning True on success and False once retries run out."""
+        with metrics.timer("smtp_send_seconds"):
+            sent = self._send(msg)
+        metrics.increment("emails_total", result="sent" if sent else "failed")
+        return sent
+
+    def _send(self, msg):
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                time.sleep(self.backoff_seconds * 2 ** (attempt - 1))
+
+            try:
+                session = self._acquire()
+            except (smtplib.SMTPException, OSError) as e:
+                last_error = e
+                continue
+
+            # SMTP replies are checked first: every SMTPException is also an OSError
+            try:
+                session.server.send_message(msg)
+            except (smtplib.SMTPResponseException, smtplib.SMTPRecipientsRefused) as e:
+                self._release(session)
+                last_error = e
+                if self._is_temporary(e):
+                    continue
+                break
+            except (smtplib.SMTPServerDisconnected, OSError) as e:
+                # The session is gone; drop it so the retry opens a fresh one
+                self._release(session, reusable=False)
+                last_error = e
+                continue
+            except Exception as e:
+                # e.g. a malformed message; the session's state is unknown, so close it and give up
+                self._release(session, reusable=False)
+                last_error = e
+                break
+
+            session.sent += 1
+            self._release(session)
+            return True
+
+        print(f"❌ Failed to send email '{msg['Subject']}': {last_error}")
+        return False
+
+    def send_many(self, messages):
+        """Sends messages concurrently on ``sender_threads`` threads; returns one bool per message."""
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.sender_threads, thread_name_prefix="mail-sender")
+        return list(self._executor.map(self.send, messages))
+
+    def close(self):
+        """Closes every idle session."""
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+_dispatcher = None
+_dispatcher_lock = threading.Lock()
+
+
+def get_dispatcher():
+    """Returns the process-wide dispatcher built from Config."""
+    global _dispatcher
+    with _dispatcher_lock:
+        if _dispatcher is None:
+            _dispatcher = MailDispatcher.from_config()
+        return _dispatcher
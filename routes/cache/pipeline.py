@@ -0,0 +1,160 @@
+import os
+import queue
+import threading
+import time
+
+from routes.cache.config import Config
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+class IssuePipeline:
+    """Routes new issues as soon as they are reported.
+
+    ``notify`` pushes an issue id onto an in-process queue. Only one process
+    (the leader, holding an exclusive lock on ``lock_path``) consumes it, so
+    several gunicorn workers never process the same issue. Workers that are
+    not the leader touch ``signal_path`` instead, which the leader polls.
+    A full ``sweep`` still runs every ``reconcile_interval`` seconds as a
+    safety net for anything the events missed.
+
+    The consumer thread belongs to the process that started it. A process
+    forked after ``start`` (e.g. a ``gunicorn --preload`` worker) forgets
+    the inherited leadership and queue, and starts its own thread on its
+    first request or ``notify``.
+    """
+
+    def __init__(self, lock_path, signal_path, poll_interval=0.5, reconcile_interval=300, leader_retry_interval=5):
+        self.lock_path = lock_path
+        self.signal_path = signal_path
+        self.poll_interval = poll_interval
+        self.reconcile_interval = reconcile_interval
+        self.leader_retry_interval = leader_retry_interval
+        self.is_leader = False
+        self._queue = queue.Queue()
+        self._lock_file = None
+        self._signal_seen = None
+        self._thread = None
+        self._app = None
+        self._pid = None
+        if hasattr(os, "register_at_fork"):
+            os.register_at_fork(after_in_child=self._after_fork)
+
+    def start(self, app, process_ids, sweep):
+        """Starts the consumer thread.
+
+        ``process_ids(ids)`` handles queued issues and ``sweep(full)`` scans for
+        unsent ones (``full`` on the periodic safety-net run); both run inside
+        an app context.
+        """
+        if self._thread is not None:
+            return
+        self._app = app
+        self._process_ids = process_ids
+        self._sweep = sweep
+        app.before_request(self.ensure_running)
+        self.ensure_running()
+
+    def ensure_running(self):
+        """Starts the consumer thread in this process if it has none, e.g. in a freshly forked worker."""
+        if self._app is None or self._pid == os.getpid():
+            return
+        self._pid = os.getpid()
+        self._thread = threading.Thread(target=self._run, name="issue-pipeline", daemon=True)
+        self._thread.start()
+
+    def _after_fork(self):
+        # Threads do not survive a fork; the parent keeps its lock, so the child starts as a follower
+        self.is_leader = False
+        self._queue = queue.Queue()
+        self._lock_file = None
+        self._thread = None
+
+    def notify(self, issue_id):
+        """Queues a newly committed issue for routing."""
+        self.ensure_running()
+        if self.is_leader:
+            self._queue.put(issue_id)
+            return
+        self.request_sweep()
+
+    def request_sweep(self):
+        """Asks the leader for a sweep of all unsent issues, e.g. after a bulk upload."""
+        try:
+            with open(self.signal_path, "a"):
+                os.utime(self.signal_path)
+        except OSError as e:
+            print(f"❌ Could not signal the issue pipeline: {e}")
+
+    def _try_become_leader(self):
+        os.makedirs(os.path.dirname(self.lock_path) or ".", exist_ok=True)
+        lock_file = open(self.lock_path, "a+")
+        try:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            else:
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_NBLCK, 1)
+        except OSError:
+            lock_file.close()
+            return False
+        self._lock_file = lock_file  # Held for the life of the process
+        return True
+
+    def _signal_mtime(self):
+        try:
+            return os.stat(self.signal_path).st_mtime_ns
+        except FileNotFoundError:
+            return 0
+
+    def _signalled(self):
+        mtime = self._signal_mtime()
+        changed = mtime != self._signal_seen
+        self._signal_seen = mtime
+        return changed
+
+    def _drain(self):
+        issue_ids = set()
+        try:
+            issue_ids.add(self._queue.get(timeout=self.poll_interval))
+            while True:
+                issue_ids.add(self._queue.get_nowait())
+        except queue.Empty:
+            pass
+        return issue_ids
+
+    def _run(self):
+        last_sweep = None
+        while True:
+            if not self.is_leader:
+                self.is_leader = self._try_become_leader()
+                if not self.is_leader:
+                    time.sleep(self.leader_retry_interval)
+                    continue
+                self._signal_seen = self._signal_mtime()
+                print("✅ This process is now routing new issues.")
+
+            issue_ids = self._drain()
+            sweep_due = last_sweep is None or time.monotonic() - last_sweep >= self.reconcile_interval
+            try:
+                with self._app.app_context():
+                    if sweep_due:
+                        last_sweep = time.monotonic()
+                        self._sweep(full=True)
+                    elif self._signalled():
+                        self._sweep(full=False)
+                    elif issue_ids:
+                        self._process_ids(sorted(issue_ids))
+            except Exception as e:
+                print(f"❌ Issue pipeline error: {e}")
+
+
+pipeline = IssuePipeline(
+    Config.PIPELINE_LOCK_PATH,
+    Config.PIPELINE_SIGNAL_PATH,
+    poll_interval=Config.PIPELINE_POLL_INTERVAL,
+    reconcile_interval=Config.PIPELINE_RECONCILE_INTERVAL,
+)
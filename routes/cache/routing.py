@@ -0,0 +1,176 @@
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from routes.cache.instrumentation import metrics
+
+RETRYABLE_STATUS_CODES = {408, 409, 429}
+
+
+class TokenBucket:
+    """Blocking token-bucket rate limiter shared by all routing threads."""
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity or max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+def _retry_after(error):
+    """Seconds the server asked us to wait (Retry-After header), if any."""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+def _is_retryable(error):
+    status_code = getattr(error, "status_code", None)
+    if status_code is not None:
+        return status_code in RETRYABLE_STATUS_CODES or status_code >= 500
+    try:
+        from groq import APIConnectionError
+        if isinstance(error, APIConnectionError):
+            return True
+    except ImportError:
+        pass
+    return isinstance(error, (TimeoutError, ConnectionError))
+
+
+class RoutingEngine:
+    """Routes issue descriptions to departments with an LLM, many at a time.
+
+    Calls run on up to ``max_concurrency`` threads, share a token bucket of
+    ``requests_per_second``, time out after ``timeout`` seconds and are retried
+    with jittered exponential backoff (honouring Retry-After on 429s).
+    ``client`` is anything exposing ``chat.completions.create`` (e.g. Groq).
+    With a ``cache`` (see RoutingCache), cache hits skip the network call.
+    """
+
+    def __init__(self, client, model, system_prompt, normalize=None, max_concurrency=8,
+                 requests_per_second=5.0, max_retries=3, backoff_seconds=0.5, timeout=20.0, cache=None):
+        self.client = client
+        self.cache = cache
+        self.model = model
+        self.system_prompt = system_prompt
+        self.normalize = normalize or (lambda department: department)
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+        self.timeout = timeout
+        self._bucket = TokenBucket(requests_per_second)
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="llm-routing")
+
+    def _complete(self, description):
+        self._bucket.acquire()
+        chat_completion = self.client.chat.completions.create(
+            messages=[self.system_prompt, {"role": "user", "content": description}],
+            model=self.model,
+            timeout=self.timeout,
+        )
+        return chat_completion.choices[0].message.content.strip()
+
+    def route(self, description):
+        """Returns the department for one description, or None if every attempt failed."""
+        if self.cache is not None:
+            department = self.cache.get(description)
+            if department is not None:
+                return department
+
+        with metrics.timer("llm_request_seconds"):
+            department = self._route_remote(description)
+        if department is not None and self.cache is not None:
+            self.cache.put(description, department)
+        return department
+
+    def _route_remote(self, description):
+        for attempt in range(self.max_retries + 1):
+            try:
+                return self.normalize(self._complete(description))
+            except Exception as e:
+                if attempt == self.max_retries or not _is_retryable(e):
+                    print(f"❌ Department routing failed: {e}")
+                    return None
+                delay = _retry_after(e)
+                if delay is None:
+                    # Full jitter keeps retrying threads from hitting the API in lockstep
+                    delay = random.uniform(0, self.backoff_seconds * 2 ** attempt)
+                time.sleep(delay)
+        return None
+
+    def route_many(self, descriptions):
+        """Routes descriptions concurrently; returns departments (None on failure) in input order.
+
+        Cached descriptions are answered up front, and repeated descriptions
+        within the batch share a single remote call.
+        """
+        if self.cache is None:
+            return list(self._executor.map(self.route, descriptions))
+
+        from routes.cache.routing_cache import normalize_description
+
+        departments = [self.cache.get(description) for description in descriptions]
+        misses = {}
+        for position, description in enumerate(descriptions):
+            if departments[position] is None:
+                misses.setdefault(normalize_description(description), []).append(position)
+
+        if misses:
+            groups = list(misses.values())
+            representatives = [descriptions[positions[0]] for positions in groups]
+            for positions, department in zip(groups, self._executor.map(self._route_remote, representatives)):
+                if department is not None:
+                    self.cache.put(descriptions[positions[0]], department)
+                for position in positions:
+                    departments[position] = department
+        return departments
+
+
+class RoutingStats:
+    """Counts how many issues each routing tier decided and the time it spent on them."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counts = {"local": 0, "llm": 0, "failed": 0}
+        self.seconds = {"local": 0.0, "llm": 0.0}
+
+    def record(self, tier, count, seconds=0.0):
+        with self._lock:
+            self.counts[tier] = self.counts.get(tier, 0) + count
+            if tier in self.seconds:
+                self.seconds[tier] += seconds
+        metrics.increment("issues_routed_total", count, tier=tier)
+
+    def snapshot(self):
+        """Counters plus the local fraction and the LLM time the local tier saved."""
+        with self._lock:
+            counts, seconds = dict(self.counts), dict(self.seconds)
+        routed = counts["local"] + counts["llm"]
+        # The LLM tier's own average is the best estimate of what a locally routed issue would have cost
+        llm_per_issue = seconds["llm"] / counts["llm"] if counts["llm"] else None
+        return {
+            "counts": counts,
+            "seconds": {tier: round(value, 3) for tier, value in seconds.items()},
+            "local_fraction": counts["local"] / routed if routed else None,
+            "llm_seconds_per_issue": round(llm_per_issue, 4) if llm_per_issue is not None else None,
+            "estimated_seconds_saved": (
+                round(counts["local"] * llm_per_issue - seconds["local"], 3) if llm_per_issue is not None else None
+            ),
+        }
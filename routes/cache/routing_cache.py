@@ -0,0 +1,147 @@
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+
+from routes.cache.instrumentation import metrics
+
+_NON_WORD = re.compile(r"[^\w\s]+")
+_SPACES = re.compile(r"\s+")
+
+
+def normalize_description(text):
+    """Lower-cases, drops punctuation and collapses whitespace so trivial variants share a key."""
+    return _SPACES.sub(" ", _NON_WORD.sub(" ", (text or "").lower())).strip()
+
+
+class RoutingCache:
+    """SQLite-backed cache of LLM routing decisions.
+
+    Entries are keyed by a hash of the normalized description and ``version``
+    (prompt + model), expire after ``ttl_seconds`` and are evicted least
+    recently used first above ``max_entries``. When ``similarity_threshold`` and
+    ``vectorizer_provider`` are set, a miss falls back to the most similar
+    cached description (cosine similarity of TF-IDF vectors).
+    """
+
+    def __init__(self, path, version, ttl_seconds=30 * 24 * 3600, max_entries=100000,
+                 similarity_threshold=None, vectorizer_provider=None, evict_every=100):
+        self.path = path
+        self.version = version
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.similarity_threshold = similarity_threshold
+        self.vectorizer_provider = vectorizer_provider
+        self.evict_every = evict_every
+        self.hits = 0
+        self.near_hits = 0
+        self.misses = 0
+        self._puts = 0
+        self._lock = threading.Lock()
+        self._index = None
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS routing_cache ("
+            " key TEXT PRIMARY KEY, version TEXT NOT NULL, normalized TEXT NOT NULL,"
+            " department TEXT NOT NULL, created_at REAL NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS ix_routing_cache_last_used ON routing_cache (last_used)")
+
+    def key(self, normalized):
+        return hashlib.sha256(f"{self.version}\0{normalized}".encode("utf-8")).hexdigest()
+
+    def get(self, description):
+        """Returns the cached department for ``description``, or None on a miss."""
+        normalized = normalize_description(description)
+        key = self.key(normalized)
+        now = time.time()
+
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT department, created_at FROM routing_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None and now - row[1] <= self.ttl_seconds:
+                self._conn.execute("UPDATE routing_cache SET last_used = ? WHERE key = ?", (now, key))
+                self.hits += 1
+                metrics.increment("routing_cache_lookups_total", result="hit")
+                return row[0]
+            if row is not None:
+                self._conn.execute("DELETE FROM routing_cache WHERE key = ?", (key,))
+
+        department = self._near_duplicate(normalized)
+        if department is not None:
+            self.near_hits += 1
+            metrics.increment("routing_cache_lookups_total", result="near_hit")
+            return department
+
+        self.misses += 1
+        metrics.increment("routing_cache_lookups_total", result="miss")
+        return None
+
+    def put(self, description, department):
+        normalized = normalize_description(description)
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO routing_cache (key, version, normalized, department, created_at, last_used)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (self.key(normalized), self.version, normalized, department, now, now),
+            )
+            self._puts += 1
+            if self._puts % self.evict_every == 0:
+                self._evict(now)
+            if self._index is not None:
+                self._index["pending"].append((normalized, department))
+
+    def _evict(self, now):
+        """Drops expired entries, then least recently used ones above max_entries. Caller holds the lock."""
+        self._conn.execute("DELETE FROM routing_cache WHERE created_at < ?", (now - self.ttl_seconds,))
+        (count,) = self._conn.execute("SELECT COUNT(*) FROM routing_cache").fetchone()
+        if count > self.max_entries:
+            self._conn.execute(
+                "DELETE FROM routing_cache WHERE key IN"
+                " (SELECT key FROM routing_cache ORDER BY last_used LIMIT ?)",
+                (count - self.max_entries,),
+            )
+            self._index = None
+
+    def _near_duplicate(self, normalized):
+        if not self.similarity_threshold or self.vectorizer_provider is None:
+            return None
+        vectorizer = self.vectorizer_provider()
+        if vectorizer is None:
+            return None
+
+        import scipy.sparse as sp
+
+        with self._lock:
+            index = self._index
+            if index is None or index["vectorizer"] is not vectorizer:
+                rows = self._conn.execute(
+                    "SELECT normalized, department FROM routing_cache WHERE version = ? AND created_at >= ?",
+                    (self.version, time.time() - self.ttl_seconds),
+                ).fetchall()
+                index = self._index = {"vectorizer": vectorizer, "departments": [], "matrix": None, "pending": rows}
+            if index["pending"]:
+                texts, departments = zip(*index["pending"])
+                vectors = vectorizer.transform(list(texts))
+                index["matrix"] = vectors if index["matrix"] is None else sp.vstack([index["matrix"], vectors]).tocsr()
+                index["departments"].extend(departments)
+                index["pending"] = []
+            matrix, departments = index["matrix"], index["departments"]
+
+        if matrix is None or not departments:
+            return None
+        # TF-IDF rows are L2-normalized, so the dot product is the cosine similarity
+        similarities = (matrix @ vectorizer.transform([normalized]).T).toarray().ravel()
+        best = similarities.argmax()
+        if similarities[best] >= self.similarity_threshold:
+            return departments[best]
+        return None
@@ -1,7 +1,12 @@
-from flask import Blueprint, request, jsonify
+import json
+from datetime import datetime
+from flask import Blueprint, Response, request, jsonify, stream_with_context
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from models.issue import Issue
 from models import db
+from routes.cache.config import Config
+from routes.cache.ingest import detect_format, iter_upload_chunks
+from routes.cache.pipeline import pipeline
 
 issues_blueprint = Blueprint("issues", __name__)
 
@@ -25,10 +30,91 @@ def report_issue():
 
     db.session.add(new_issue)
     db.session.commit()
+    pipeline.notify(new_issue.id)  # ✅ Route it now instead of waiting for the next sweep
 
     return jsonify({"message": "Issue reported successfully", "issue_id": new_issue.id}), 201
 
 
+def _insert_issue_chunk(chunk, user_id, classify):
+    """Inserts the valid rows of one upload chunk in a single transaction; returns per-row results."""
+    valid = [(number, description) for number, description, error in chunk if error is None]
+
+    departments = [None] * len(valid)
+    if classify and valid:
+        from routes.cache.email import get_local_routings
+
+        # ✅ Same rules as the local routing tier; rows it is unsure of are left for the sweep's LLM
+        departments = get_local_routings([description for _, description in valid])
+
+    now = datetime.utcnow()
+    mappings = [{
+        "description": description,
+        "user_id": user_id,
+        "status": "Pending",
+        "department": department,
+        "routing_tier": "local" if department else None,
+        "sent_to_department": False,
+        "created_at": now,
+    } for (_, description), department in zip(valid, departments)]
+
+    db.session.bulk_insert_mappings(Issue, mappings, return_defaults=True)
+    db.session.commit()
+
+    ids = {number: mapping["id"] for (number, _), mapping in zip(valid, mappings)}
+    return [
+        {"row": number, "issue_id": ids[number]} if error is None else {"row": number, "error": error}
+        for number, _, error in chunk
+    ]
+
+
+@issues_blueprint.route("/bulk", methods=["POST"])
+@jwt_required()
+def bulk_report_issues():
+    """Submits many issues from one CSV, XLSX or NDJSON upload.
+
+    Send the file as multipart ``file`` or as the raw request body with a
+    matching Content-Type. Rows need a ``Description`` column (or key);
+    ``classify=true`` assigns departments with the selected ML model before
+    the issues are stored, under the local routing tier's rules: nothing is
+    assigned while ``ROUTING_LOCAL_CONFIDENCE`` is None.
+    """
+    user_id = int(get_jwt_identity())
+
+    file = request.files.get("file")
+    if file:
+        stream, upload_format = file.stream, detect_format(file.filename, file.mimetype)
+    else:
+        stream, upload_format = request.stream, detect_format(mimetype=request.mimetype)
+    if upload_format is None:
+        return jsonify({"error": "Upload a .csv, .xlsx or .ndjson file"}), 400
+
+    classify = request.args.get("classify", request.form.get("classify", "")).lower() in ("1", "true", "yes")
+    if classify:
+        from routes.cache.email import refresh_selected_model
+
+        refresh_selected_model()  # ✅ Pick up a selection saved by another worker
+
+    results = []
+    try:
+        for chunk in iter_upload_chunks(stream, upload_format, Config.BULK_INSERT_CHUNK_SIZE):
+            results.extend(_insert_issue_chunk(chunk, user_id, classify))
+    except Exception as e:
+        db.session.rollback()
+        inserted = sum(1 for result in results if "issue_id" in result)
+        return jsonify({"error": f"Could not read the upload: {e}", "inserted": inserted, "results": results}), 400
+    finally:
+        if any("issue_id" in result for result in results):
+            pipeline.request_sweep()  # ✅ One sweep for the whole upload instead of one event per issue
+
+    inserted = sum(1 for result in results if "issue_id" in result)
+    return jsonify({
+        "message": f"{inserted} issues reported successfully",
+        "inserted": inserted,
+        "failed": len(results) - inserted,
+        "results": results,
+    }), 201 if inserted else 400
+
+
 @issues_blueprint.route("/status", methods=["GET"])
 @jwt_required()
 def get_issue_status():
@@ -49,20 +135,85 @@ def get_issue_status():
     }), 200
 
 
+@issues_blueprint.route("/routing-stats", methods=["GET"])
+@jwt_required()
+def get_routing_stats():
+    """How many issues the local model routed versus the LLM, overall and since this process started."""
+    from routes.cache.email import routing_stats
+
+    counts = dict(
+        db.session.query(Issue.routing_tier, db.func.count(Issue.id))
+        .filter(Issue.routing_tier.isnot(None))
+        .group_by(Issue.routing_tier)
+        .all()
+    )
+    routed = counts.get("local", 0) + counts.get("llm", 0)  # Parked "failed" issues were never routed
+    return jsonify({
+        "threshold": Config.ROUTING_LOCAL_CONFIDENCE,
+        "routed_by_tier": counts,
+        "local_fraction": counts.get("local", 0) / routed if routed else None,
+        "process": routing_stats.snapshot(),  # ✅ Timings are only known for this worker
+    }), 200
+
+
+
+def _user_issue_page(user_id, after_id, limit, status=None, department=None):
+    """One keyset page of a user's reports, oldest first, without loading full ORM objects."""
+    query = Issue.query.with_entities(Issue.id, Issue.description, Issue.status, Issue.department).filter(
+        Issue.user_id == user_id, Issue.id > after_id
+    )
+    if status:
+        query = query.filter(Issue.status == status)
+    if department:
+        query = query.filter(Issue.department == department)
+    return query.order_by(Issue.id).limit(limit).all()
+
+
+def _issue_row(row):
+    return {
+        "id": row.id,
+        "description": row.description,
+        "status": row.status,
+        "department": row.department if row.department else "Pending"
+    }
+
 
 @issues_blueprint.route("/user-reports", methods=["GET"])
 @jwt_required()
 def get_user_issues():
-    """ Fetch all reports submitted by the logged-in user """
-    user_id = get_jwt_identity()
+    """ Fetch the logged-in user's reports, one keyset page at a time
 
-    issues = Issue.query.filter_by(user_id=user_id).all()
-    
-    issues_list = [{
-        "id": issue.id,
-        "description": issue.description,
-        "status": issue.status,
-        "department": issue.department if issue.department else "Pending"
-    } for issue in issues]
+    Query parameters: ``cursor`` (``next_cursor`` of the previous page),
+    ``limit``, ``status``, ``department``. ``format=ndjson`` streams every
+    matching report as one JSON object per line instead.
+    """
+    user_id = int(get_jwt_identity())
+
+    try:
+        after_id = int(request.args.get("cursor", 0))
+        limit = min(int(request.args.get("limit", Config.USER_REPORTS_PAGE_SIZE)), Config.USER_REPORTS_MAX_PAGE_SIZE)
+    except ValueError:
+        return jsonify({"error": "cursor and limit must be integers"}), 400
+    if limit < 1:
+        return jsonify({"error": "limit must be positive"}), 400
+
+    status = request.args.get("status")
+    department = request.args.get("department")
+
+    if request.args.get("format") == "ndjson":
+        def generate(after_id):
+            # ✅ Pages are fetched as the client reads, so memory stays at one page
+            while True:
+                rows = _user_issue_page(user_id, after_id, limit, status, department)
+                for row in rows:
+                    yield json.dumps(_issue_row(row)) + "\n"
+                if len(rows) < limit:
+                    return
+                after_id = rows[-1].id
+
+        return Response(stream_with_context(generate(after_id)), mimetype="application/x-ndjson")
+
+    rows = _user_issue_page(user_id, after_id, limit, status, department)
+    next_cursor = rows[-1].id if len(rows) == limit else None
 
-    return jsonify({"issues": issues_list}), 200
+    return jsonify({"issues": [_issue_row(row) for row in rows], "next_cursor": next_cursor}), 200
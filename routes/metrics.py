@@ -0,0 +1,14 @@
+from flask import Blueprint, Response, jsonify
+from routes.cache.instrumentation import metrics
+
+metrics_blueprint = Blueprint("metrics", __name__)
+
+
+@metrics_blueprint.route("", methods=["GET"])
+def get_metrics():
+    """Request, sweep, LLM, SMTP and model timings of this process, in the Prometheus text format."""
+    if not metrics.enabled:
+        return jsonify({"error": "Metrics are disabled (METRICS_ENABLED=0)"}), 404
+
+    # ✅ Unauthenticated like any Prometheus target; keep it off the public listener in production
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
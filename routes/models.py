@@ -1,50 +1,108 @@
 import os
 import json
-import joblib
-import pandas as pd
-from flask import Blueprint, request, jsonify, Response, stream_with_context
+from flask import Blueprint, request, jsonify, Response, stream_with_context, url_for
 import time
 from flask_jwt_extended import get_jwt, jwt_required, get_jwt_identity
 from werkzeug.utils import secure_filename
+from ml.datasets import TEXT_COLUMN, dataset_format, iter_dataset
+from ml.registry import registry
+from ml.sweep import SWEEP_METRICS, parameter_grid
+from routes.cache import instrumentation
+from routes.cache.config import Config
 
 models_blueprint = Blueprint("models", __name__)
 
 MODEL_FOLDER = "mlmodels"
-TEMP_PARAM_FILE = "train_params.json"
 
 if not os.path.exists(MODEL_FOLDER):
     os.makedirs(MODEL_FOLDER)
 
 
 def load_model(model_name):
-    """ Load a pre-trained model from disk with compatibility handling """
-    model_path = os.path.join(MODEL_FOLDER, f"{model_name.lower()}_model.pkl")
-
-    if not os.path.exists(model_path):
-        print(f"❌ Error: Model file '{model_path}' not found.")
-        return None  # Prevents Flask from crashing
-
+    """ Load a pre-trained model from the in-memory registry with compatibility handling """
     try:
-        return joblib.load(model_path)  # No fix_imports=True (caused issues in testing)
+        bundle = registry.get(model_name)
     except Exception as e:
         print(f"❌ Error loading model: {e}")
         return None  # Prevents errors from stopping execution
 
+    if bundle is None:
+        print(f"❌ Error: Model file '{registry.model_path(model_name)}' not found.")
+        return None  # Prevents Flask from crashing
+
+    return bundle.model
+
 
 from flask_jwt_extended import get_jwt, verify_jwt_in_request  
-import subprocess
+from ml.jobs import TrainingJobQueue
 
-@models_blueprint.route("/train", methods=["POST"])
-@jwt_required()
-def train_model():
-    """ Trains the selected model with user-specified hyperparameters """
+# ✅ Finished jobs wrote new artifacts, so make the registry re-check them
+training_jobs = TrainingJobQueue(max_workers=Config.TRAINING_WORKERS, on_finished=lambda job_id: registry.invalidate())
 
+
+def _require_super_user():
+    """ Returns an error response unless the caller is a super user """
     verify_jwt_in_request()
     claims = get_jwt()
     user_type = claims.get("user_type")
 
     if not user_type or user_type != "super":
         return jsonify({"error": "Unauthorized! Only super users can train models"}), 403
+    return None
+
+
+STREAM_MIMETYPES = {
+    "ndjson": "application/x-ndjson",
+    "sse": "text/event-stream",
+}
+
+
+def _stream_format():
+    """ 'ndjson' or 'sse' when the client asked for progress events (?stream=... or Accept), else None """
+    requested = request.args.get("stream") or request.form.get("stream")
+    if requested in STREAM_MIMETYPES:
+        return requested
+    if request.accept_mimetypes.best_match(list(STREAM_MIMETYPES.values())) == "text/event-stream":
+        return "sse"
+    return None
+
+
+def _event_stream(events, stream_format):
+    """ Streams event dicts as NDJSON lines or server-sent events
+
+    A client that disconnects closes the generator, which stops the work at
+    the next event.
+    """
+    def generate():
+        for event in events:
+            if stream_format == "sse":
+                yield f"event: {event['event']}\ndata: {json.dumps(event)}\n\n"
+            else:
+                yield json.dumps(event) + "\n"
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype=STREAM_MIMETYPES[stream_format],
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},  # ✅ No proxy buffering
+    )
+
+
+def _job_events(job_id):
+    """ Training job status changes as events, with heartbeats so idle connections stay open """
+    for status in training_jobs.watch(job_id, Config.STREAM_POLL_INTERVAL, Config.STREAM_HEARTBEAT_SECONDS):
+        if status is None:
+            yield {"event": "heartbeat"}
+        else:
+            yield {"event": "status", **status}
+
+
+@models_blueprint.route("/train", methods=["POST"])
+@jwt_required()
+def train_model():
+    """ Queues a training job for the selected model with user-specified hyperparameters """
+    error = _require_super_user()
+    if error:
+        return error
 
     file = request.files.get("file")
     model_name = request.form.get("model")
@@ -52,29 +110,103 @@ def train_model():
     if not file or not model_name:
         return jsonify({"error": "Missing required fields"}), 400
 
-    filename = secure_filename(file.filename)
-    file_path = os.path.join("uploads", filename)
+    # ✅ Get hyperparameters; comma-separated values ("3,4,5") turn the job into a sweep
+    hyperparameters = {key: request.form[key] for key in request.form if key not in ["file", "model", "stream", "metric"]}
+    grid = parameter_grid(hyperparameters)
+    candidates = len(grid)
+    if not candidates:
+        return jsonify({"error": "The parameter grid is empty"}), 400
+    if candidates > Config.SWEEP_MAX_CANDIDATES:
+        return jsonify({"error": f"The parameter grid has {candidates} candidates, the limit is {Config.SWEEP_MAX_CANDIDATES}"}), 400
+
+    # ✅ Reject unparseable values here rather than in the queued job
+    from ml.training import build_model
+    try:
+        for candidate in grid:
+            build_model(model_name, candidate)
+    except ValueError as e:
+        return jsonify({"error": f"Invalid hyperparameters: {e}"}), 400
+
+    metric = request.form.get("metric")
+    if metric and metric not in SWEEP_METRICS:
+        return jsonify({"error": f"Unknown sweep metric '{metric}'. Use one of: {', '.join(SWEEP_METRICS)}"}), 400
+
+    try:
+        dataset_format(file.filename)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    # ✅ Every job gets its own dataset copy and parameter file
+    options = {"metric": metric, "n_jobs": Config.SWEEP_N_JOBS} if candidates > 1 else None
+    job_id, file_path = training_jobs.create(model_name, hyperparameters, secure_filename(file.filename), options)
     file.save(file_path)
+    training_jobs.start(job_id)
 
-    # ✅ Get hyperparameters
-    hyperparameters = {key: request.form[key] for key in request.form if key not in ["file", "model"]}
+    stream_format = _stream_format()
+    if stream_format:
+        return _event_stream(_job_events(job_id), stream_format)
 
-    # ✅ Save parameters to JSON
-    PARAMS_FILE = "train_params.json"
-    params = {
-        "dataset_path": file_path,
-        "model": model_name,
-        "hyperparameters": hyperparameters
-    }
-    with open(PARAMS_FILE, "w") as f:
-        json.dump(params, f)
+    return jsonify({
+        "message": f"{model_name} sweep of {candidates} candidates queued" if candidates > 1 else f"{model_name} training queued",
+        "job_id": job_id,
+        "status_url": url_for("models.get_training_job", job_id=job_id)
+    }), 202
+
+
+@models_blueprint.route("/update", methods=["POST"])
+@jwt_required()
+def update_incremental_model():
+    """ Updates the incremental (minibatch) model with issues reported since its last checkpoint """
+    error = _require_super_user()
+    if error:
+        return error
+
+    from ml.incremental import update_from_issues
+
+    data = request.get_json(silent=True) or {}
+    try:
+        n_clusters = int(data.get("n_clusters", 5))
+    except (TypeError, ValueError):
+        n_clusters = 0
+    if n_clusters < 1:
+        return jsonify({"error": "n_clusters must be a positive integer"}), 400
 
-    # ✅ Correctly run Jupyter Notebook (NO ARGUMENTS, just executes normally)
     try:
-        subprocess.run(["jupyter", "nbconvert", "--execute", "train.ipynb", "--to", "notebook", "--output", "train_output.ipynb", "--ExecutePreprocessor.timeout=600"], check=True)
-        return jsonify({"message": f"{model_name} trained successfully!"}), 200
-    except subprocess.CalledProcessError as e:
-        return jsonify({"error": f"Training failed: {str(e)}"}), 500
+        summary = update_from_issues(n_clusters=n_clusters)
+    except Exception as e:
+        return jsonify({"error": f"Incremental update failed: {str(e)}"}), 500
+
+    registry.invalidate(summary["model"])
+    return jsonify({"message": "Incremental model updated", **summary}), 200
+
+
+@models_blueprint.route("/jobs/<job_id>", methods=["GET"])
+@jwt_required()
+def get_training_job(job_id):
+    """ Returns the status, progress and metrics of a training job """
+    error = _require_super_user()
+    if error:
+        return error
+
+    status = training_jobs.status(job_id)
+    if status is None:
+        return jsonify({"error": "Training job not found"}), 404
+
+    return jsonify(status), 200
+
+
+@models_blueprint.route("/jobs/<job_id>/events", methods=["GET"])
+@jwt_required()
+def stream_training_job(job_id):
+    """ Streams a training job's stage, progress and stage timings until it finishes """
+    error = _require_super_user()
+    if error:
+        return error
+
+    if training_jobs.status(job_id) is None:
+        return jsonify({"error": "Training job not found"}), 404
+
+    return _event_stream(_job_events(job_id), _stream_format() or "ndjson")
 
 
 @models_blueprint.route("/test", methods=["POST"])
@@ -92,66 +224,136 @@ def test_model():
         return jsonify({"error": f"Model '{model_name}' not found or incompatible. Please retrain it."}), 404
 
     filename = secure_filename(file.filename)
+    try:
+        dataset_format(filename)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     file_path = os.path.join("uploads", filename)
     file.save(file_path)
 
-    # ✅ Load TF-IDF Vectorizer (Ensure test features match training)
-    tfidf_path = "mlmodels/tfidf_vectorizer.pkl"
-    if not os.path.exists(tfidf_path):
+    # ✅ TF-IDF Vectorizer comes with the model (Ensure test features match training)
+    bundle = registry.get(model_name)
+    tfidf = bundle.vectorizer
+    if tfidf is None:
         return jsonify({"error": "TF-IDF vectorizer not found. Please retrain the model."}), 500
 
-    tfidf = joblib.load(tfidf_path)  # Load trained TF-IDF
+    events = _test_events(model, tfidf, file_path, bundle.table)
 
-    # ✅ Load test dataset
-    try:
-        test_data = pd.read_excel(file_path, engine="openpyxl")
-    except Exception:
-        return jsonify({"error": "Invalid test file format. Please upload a valid .xlsx file"}), 400
+    stream_format = _stream_format()
+    if stream_format:
+        return _event_stream(events, stream_format)
 
-    if "Description" not in test_data.columns:
-        return jsonify({"error": "Invalid test file format. 'Description' column is required"}), 400
+    for event in events:
+        pass  # ✅ Only the final event matters without streaming
+    if event["event"] == "error":
+        return jsonify({"error": event["error"]}), event["status"]
 
-    # ✅ Transform test data using trained TF-IDF
-    X_test = tfidf.transform(test_data["Description"])
+    return jsonify({
+        "message": event["message"],
+        "predictions": event["predictions"],
+        "metrics": event["metrics"],
+        "timings": event["timings"]
+    }), 200
 
-    # ✅ Predict clusters (Handle errors gracefully)
-    try:
-        predictions = model.predict(X_test.toarray())
-    except Exception as e:
-        return jsonify({"error": f"Model prediction failed: {str(e)}"}), 500
 
-    test_data['Predicted_Cluster'] = predictions
+def _test_events(model, tfidf, file_path, table=None):
+    """ Tests ``model`` on a dataset file, yielding progress events as it goes
 
-    # ✅ Compute Evaluation Metrics
-    from sklearn.metrics import silhouette_score, davies_bouldin_score, adjusted_rand_score
-    from scipy.spatial.distance import cdist
+    ``chunk`` events carry the rows read so far and that chunk's predictions,
+    ``metric`` events each metric as it is computed. The last event is
+    ``result`` or ``error``.
+    """
+    # ✅ numpy/scipy/sklearn load on the first test, not when a worker boots
     import numpy as np
-
+    import scipy.sparse as sp
+    from sklearn.metrics import adjusted_rand_score
+    from ml.inference import predict_clusters
+    from ml.metrics import iter_cluster_metrics
+
+    timings = {"load": 0.0, "vectorize": 0.0, "predict": 0.0}
+    X_blocks, prediction_blocks, true_labels = [], [], []
+    rows = 0
+
+    # ✅ Stream the test dataset chunk by chunk: transform and predict each batch as it is read
+    chunks = iter_dataset(file_path, Config.DATASET_CHUNK_SIZE)
+    while True:
+        started = time.perf_counter()
+        try:
+            chunk = next(chunks, None)
+        except Exception as e:
+            yield {"event": "error", "status": 400, "error": f"Invalid test file format. {str(e)}"}
+            return
+        timings["load"] += time.perf_counter() - started
+        if chunk is None:
+            break
+
+        started = time.perf_counter()
+        X_chunk = tfidf.transform(chunk[TEXT_COLUMN])  # Sparse CSR, a fraction of the spreadsheet's size
+        timings["vectorize"] += time.perf_counter() - started
+
+        started = time.perf_counter()
+        try:
+            predictions = predict_clusters(model, X_chunk, table)
+        except Exception as e:
+            yield {"event": "error", "status": 500, "error": f"Model prediction failed: {str(e)}"}
+            return
+        timings["predict"] += time.perf_counter() - started
+
+        X_blocks.append(X_chunk)
+        prediction_blocks.append(predictions)
+        if "Cluster" in chunk.columns:
+            true_labels.append(chunk["Cluster"].to_numpy())
+        rows += len(chunk)
+
+        yield {
+            "event": "chunk",
+            "rows": rows,
+            "predictions": predictions.tolist(),
+            "seconds": {stage: round(seconds, 4) for stage, seconds in timings.items()},
+        }
+
+    if not X_blocks:
+        yield {"event": "error", "status": 400, "error": "The test file has no rows"}
+        return
+
+    X_test = sp.vstack(X_blocks, format="csr")
+    predictions = np.concatenate(prediction_blocks)
+
+    # ✅ Compute Evaluation Metrics (blockwise, within the configured memory budget)
     metrics = {}
 
     if hasattr(model, "inertia_"):  # For K-Means
         metrics["inertia"] = model.inertia_
 
-    if len(set(predictions)) > 1:  # Ensure at least 2 clusters exist
-        metrics["silhouette_score"] = silhouette_score(X_test, predictions)
-        metrics["davies_bouldin"] = davies_bouldin_score(X_test.toarray(), predictions)
-
-        # Compute Dunn Index
-        cluster_distances = cdist(X_test.toarray(), X_test.toarray(), metric="euclidean")
-        min_intercluster_dist = np.min(cluster_distances[np.triu_indices_from(cluster_distances, 1)])
-        max_intracluster_dist = max(
-            [np.max(cluster_distances[predictions == i][:, predictions == i]) for i in set(predictions)]
-        )
-        metrics["dunn_index"] = min_intercluster_dist / max_intracluster_dist if max_intracluster_dist > 0 else 0
-
-    if "Cluster" in test_data.columns:
-        metrics["ari"] = adjusted_rand_score(test_data["Cluster"], predictions)
-
-    return jsonify({
+    started = time.perf_counter()
+    for name, value in iter_cluster_metrics(
+        X_test,
+        predictions,
+        memory_budget_mb=Config.METRICS_MEMORY_BUDGET_MB,
+        silhouette_sample_size=Config.METRICS_SILHOUETTE_SAMPLE_SIZE,
+        dunn_exact_max_rows=Config.METRICS_DUNN_EXACT_MAX_ROWS,
+    ):
+        metrics[name] = value
+        timings[name] = time.perf_counter() - started
+        yield {"event": "metric", "name": name, "value": value, "seconds": round(timings[name], 4)}
+        started = time.perf_counter()
+
+    if len(true_labels) == len(X_blocks):
+        metrics["ari"] = adjusted_rand_score(np.concatenate(true_labels), predictions)
+        timings["ari"] = time.perf_counter() - started
+        yield {"event": "metric", "name": "ari", "value": metrics["ari"], "seconds": round(timings["ari"], 4)}
+
+    for stage, seconds in timings.items():
+        instrumentation.metrics.observe("model_test_stage_seconds", seconds, stage=stage)
+
+    yield {
+        "event": "result",
         "message": "Test completed!",
+        "rows": rows,
         "predictions": predictions.tolist(),
-        "metrics": metrics
-    }), 200
+        "metrics": metrics,
+        "timings": {stage: round(seconds, 4) for stage, seconds in timings.items()},
+    }
 
 
 from models.ml_model import MLModel
@@ -190,6 +392,7 @@ def save_model_selection():
             db.session.add(MLModel(model_name=selected_model))
         
         db.session.commit()  # ✅ Commit after inserting new model
+        registry.activate(selected_model)  # ✅ Background classification switches right away
 
         return jsonify({"message": f"Model '{selected_model}' is now selected."}), 200
 